@@ -17,6 +17,69 @@ Args:
         Default: 0.1
     --num_points (int): How many points to generate.
         Default: 10
+    --generator (str): How to generate the points ('random', 'poisson',
+        'halton', 'sobol', 'r2', 'love', 'lissajous', 'rose', 'hypotrochoid',
+        'superformula' or 'heart').
+        Default: 'random'
+    --renderer (str): How to draw the lines ('overlay', 'accumulate', 'numpy',
+        'analytic' or 'tiled').
+        Default: 'overlay'
+    --resample (str): Filter used to shrink the supersampled image ('box',
+        'gamma' or 'lanczos').
+        Default: 'lanczos'
+    --tile_size (int): Size of the tiles used by the tiled renderer.
+        Default: 512
+    --threads (int): How many tiles the tiled renderer draws at the same time.
+        Default: 1
+    --order: Reorder the points into a short path before drawing them, and
+        print how much shorter it got.
+    --order_passes (int): Most passes to make over the path to shorten it.
+        The same points always give the same path.
+        Default: 2
+    --order_budget (float): Seconds after which to stop shortening the path
+        anyway. If it runs out, the path depends on the machine's speed, and
+        a warning is printed.
+        Default: 2
+    --stream: Draw the points a chunk at a time as they're generated, so
+        memory doesn't grow with --num_points ('numpy' and 'analytic' only).
+    --workers (int): How many processes to generate images with.
+        Default: 1
+    --pipeline: Overlap point generation, drawing, encoding and writing of
+        consecutive images, each in its own thread.
+    --queue_depth (int): How many images can wait between two pipeline stages.
+        Default: 2
+    --resume: Skip the images the collection's manifest lists as finished
+        (with the same seed and parameters).
+    --shard (str): Only generate every N-th image, starting at K, given as K/N
+        (K counts from 0). Each shard keeps its own manifest.
+        Default: None (all of them)
+    --index_range (str): Only generate the images from a up to (but not
+        including) b, given as a:b.
+        Default: None (all of them)
+    --merge: Don't generate anything; combine the collection's manifests into
+        index.jsonl and report missing or duplicate images.
+    --spool (str): Folder shared by a render farm. Workers take the images
+        queued in it one at a time, until none are left.
+        Default: None
+    --submit: Don't generate anything; queue the collection's images (or the
+        slice given by --shard or --index_range) in the --spool folder.
+    --lease (float): Seconds after which an image claimed by a worker that
+        hasn't finished it is handed out again. Must be longer than the
+        slowest image.
+        Default: 600
+    --serve (str): Don't generate a collection; answer render requests
+        (GET /render?size=...&seed=...) with PNGs, on 'unix:/path/to/socket' or
+        'host:port'. GET /stats reports the load and a latency histogram.
+        Default: None
+    --max_concurrent (int): How many render requests the server takes at the
+        same time; the rest wait for a slot, or get a 503 after 10 seconds.
+        Default: twice --workers
+    --render_timeout (float): Seconds a render request can take before it
+        gets a 504 and the worker drawing it is replaced.
+        Default: 60
+    --seed (int): Makes the collection reproducible; each image gets its own
+        random stream derived from the seed and its index.
+        Default: None (different every time)
 
 Examples:
 
@@ -27,129 +90,480 @@ Examples:
     Generate 25 images in a collection named foo:
 
         $ ./generate_art.py --collection=foo --count=25
+
+    Generate 10,000 hearts on 8 processes:
+
+        $ ./generate_art.py --generator=love --count=10000 --workers=8
+
+    Pick up where that left off, after a crash:
+
+        $ ./generate_art.py --generator=love --count=10000 --workers=8 --resume
+
+    Split 50,000 images between 3 machines sharing the output folder, then
+    check nothing is missing:
+
+        $ ./generate_art.py --count=50000 --seed=1 --shard=0/3  # on machine 1
+        $ ./generate_art.py --count=50000 --seed=1 --shard=1/3  # on machine 2
+        $ ./generate_art.py --count=50000 --seed=1 --shard=2/3  # on machine 3
+        $ ./generate_art.py --count=50000 --merge
+
+    Or queue them up and start as many workers as each machine can take:
+
+        $ ./generate_art.py --count=50000 --seed=1 --spool=farm --submit
+        $ ./generate_art.py --spool=farm --workers=8  # on every machine
+        $ ./generate_art.py --count=50000 --merge
+
+    Serve images to a web front end from 4 warm processes:
+
+        $ ./generate_art.py --serve=unix:/tmp/line_art.sock --workers=4
+        $ curl --unix-socket /tmp/line_art.sock \\
+            'http://localhost/render?size=256&num_points=20&seed=7' > art.png
 """
 
 
 import argparse
+import io
 import os
-
-from PIL import Image, ImageChops, ImageDraw
-
-from src.colors.generator import interpolate, rand_color
-from src.points.generator import (
-    LovePointGenerator,
-    PointGeneratorInterface,
-    RandPointGenerator,
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from src.art.image import (
+    ArtParams,
+    Sketch,
+    render,
+    save_image,
+    sketch,
+    write_image,
 )
-from src.points.point import Point
+from src.batch.manifest import Manifest, merge_manifests
+from src.batch.pipeline import Stage, run_pipeline
+from src.batch.pool import run_pool
+from src.batch.shard import manifest_name, shard_indices
+from src.batch.spool import Spool, run_spool_worker
+from src.points.order import Ordering
+from src.render.renderer import (
+    RendererInterface,
+    StreamingRendererInterface,
+    make_renderer,
+)
+from src.server.daemon import serve
 from src.util.args import parse_args
+from src.util.files import write_atomic
+from src.util.png import encode_png
+from src.util.rng import image_rng
 
 
 def generate_art(
     collection: str,
     name: str,
-    target_size: int,
-    scale_factor: int,
-    num_points: int,
-    point_generator: PointGeneratorInterface,
-) -> None:
+    params: ArtParams,
+    rng: Optional[np.random.Generator] = None,
+    renderer: Optional[RendererInterface] = None,
+    drawing: Optional[Sketch] = None,
+) -> str:
     """Generates and saves the art piece(s).
 
+    The image only appears at its path once it's completely written.
+
     Args:
         collection (str): Folder containing the image.
         name (str): Name of the image, without the file extension.
-        target_size (int): Size of the image.
-        scale_factor (int): Scaling for antialiasing.
-        num_points (int): Number of points to generate.
-        point_generator (PointGeneratorInterface): Used to generate points.
+        params (ArtParams): How to draw the image.
+        rng (Optional[np.random.Generator]): Source of randomness.
+            Default: a freshly seeded generator.
+        renderer (Optional[RendererInterface]): Used to draw the lines.
+            Default: the one params picks.
+        drawing (Optional[Sketch]): Points and colors already picked, to
+            draw instead of picking new ones from rng.
+
+    Returns:
+        str: SHA-256 of the saved PNG, in hex.
     """
 
     # Where to store image
     output_dir: str = os.path.join("output", collection)
     img_path: str = os.path.join(output_dir, f"{name}.png")
 
-    # Parameters
-    bg_color: tuple[int, int, int] = (0, 0, 0)
-    size: int = target_size * scale_factor
-
-    # Create the directory and base image
+    # Create the directory
     os.makedirs(output_dir, exist_ok=True)
-    img: Image.Image = Image.new("RGB", (size, size), color=bg_color)
-
-    # Generate colors of lines
-    start_color: tuple[int, int, int] = rand_color()
-    end_color: tuple[int, int, int] = rand_color()
-
-    # Generate the points
-    points: list[Point] = [point_generator.generate() for _ in range(num_points)]
-
-    # Draw bounding box
-    min_x: int = points[0].x
-    max_x: int = points[0].x
-    min_y: int = points[0].y
-    max_y: int = points[0].y
-    for (x, y) in points:
-        if x < min_x:
-            min_x = x
-        if x > max_x:
-            max_x = x
-        if y < min_y:
-            min_y = y
-        if y > max_y:
-            max_y = y
-
-    # Center the image
-    delta_x = min_x - (size - max_x)
-    delta_y = min_y - (size - max_y)
-    points = [Point(x - delta_x // 2, y - delta_y // 2) for (x, y) in points]
-
-    # Draw the points
-    thickness: int = scale_factor
-    n: int = len(points) - 1
-    for i, p1 in enumerate(points):
-        # Create the overlay
-        overlay_img: Image.Image = Image.new("RGB", (size, size), color=bg_color)
-        overlay_draw: ImageDraw.ImageDraw = ImageDraw.Draw(overlay_img)
-
-        # Connect last point to first, or to the next element
-        p2 = points[0] if i == n else points[i + 1]
-
-        # Find the current color for the line
-        color_factor: float = i / n
-        line_color: tuple[int, int, int] = interpolate(
-            start_color, end_color, color_factor
+
+    # Draw the image and save it
+    return save_image(img_path, params, rng, renderer, drawing)
+
+
+def image_params(args: argparse.Namespace) -> dict[str, Any]:
+    """Collects the arguments that change how the images look.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            script.
+
+    Returns:
+        dict[str, Any]: Parameters to record alongside each image.
+    """
+
+    params: dict[str, Any] = {
+        "size": args.size,
+        "scale_factor": args.scale_factor,
+        "margin": args.margin,
+        "num_points": args.num_points,
+        "generator": args.generator,
+        "renderer": args.renderer,
+        "resample": args.resample,
+    }
+    if args.stream:
+        params["stream"] = True
+    if args.order:
+        params["order"] = True
+        params["order_passes"] = args.order_passes
+        params["order_budget"] = args.order_budget
+    return params
+
+
+def manifest_entry(
+    args: argparse.Namespace,
+    index: int,
+    sha256: str,
+    seconds: float,
+    ordering: Optional[Ordering] = None,
+) -> dict[str, Any]:
+    """Describes a finished image for the collection's manifest.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            script.
+        index (int): Which image of the collection was generated.
+        sha256 (str): SHA-256 of the saved PNG, in hex.
+        seconds (float): How long the image took to generate.
+        ordering (Optional[Ordering]): How the points were reordered, if
+            they were.
+
+    Returns:
+        dict[str, Any]: Manifest entry for the image.
+    """
+
+    entry: dict[str, Any] = {
+        "index": index,
+        "name": f"{args.collection}_img_{index}",
+        "seed": args.seed,
+        "params": image_params(args),
+        "sha256": sha256,
+        "seconds": round(seconds, 4),
+    }
+    if ordering is not None:
+        entry["stroke_length"] = {
+            "before": round(ordering.before, 1),
+            "after": round(ordering.after, 1),
+        }
+        if ordering.cut_short:
+            entry["stroke_length"]["cut_short"] = True
+    return entry
+
+
+def report_ordering(entry: dict[str, Any]) -> None:
+    """Prints how much shorter reordering made an image's path, if it did.
+
+    Args:
+        entry (dict[str, Any]): Manifest entry of the image.
+    """
+
+    if "stroke_length" in entry:
+        before: float = entry["stroke_length"]["before"]
+        after: float = entry["stroke_length"]["after"]
+        shorter: float = 1 - after / before if before else 0.0
+        print(
+            f"Ordered {entry['name']}: stroke length {before:.0f} -> "
+            f"{after:.0f} px ({shorter:.1%} shorter)"
         )
+        if entry["stroke_length"].get("cut_short"):
+            print(
+                f"{entry['name']} ran out of --order_budget, so it may differ "
+                "between machines",
+                file=sys.stderr,
+            )
+
+
+def render_index(args: argparse.Namespace, index: int) -> dict[str, Any]:
+    """Generates and saves one image of the collection.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            script.
+        index (int): Which image of the collection to generate.
+
+    Returns:
+        dict[str, Any]: Manifest entry for the image.
+    """
 
-        # Draw the line
-        overlay_draw.line((p1, p2), fill=line_color, width=thickness)
+    started: float = time.perf_counter()
+    params: ArtParams = ArtParams.from_args(args)
+    rng: np.random.Generator = image_rng(args.seed, index)
+
+    # Sketch here rather than in save_image, to keep how the points were ordered
+    drawing: Optional[Sketch] = None if params.stream else sketch(params, rng)
+    sha256: str = generate_art(
+        collection=args.collection,
+        name=f"{args.collection}_img_{index}",
+        params=params,
+        rng=rng,
+        drawing=drawing,
+    )
+    return manifest_entry(
+        args,
+        index,
+        sha256,
+        time.perf_counter() - started,
+        drawing.ordering if drawing is not None else None,
+    )
+
+
+def render_job(args: argparse.Namespace, job: dict[str, Any]) -> dict[str, Any]:
+    """Generates and saves the image described by a spool job.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            worker, for the settings that don't change how images look.
+        job (dict[str, Any]): Collection, index, seed and parameters of the
+            image, from the submitting script.
+
+    Returns:
+        dict[str, Any]: Manifest entry for the image.
+    """
+
+    # image_params leaves out the options that are off, and those mustn't
+    # come from the worker's own arguments
+    defaults: ArtParams = ArtParams()
+    job_args: argparse.Namespace = argparse.Namespace(
+        **{
+            **vars(args),
+            "stream": defaults.stream,
+            "order": defaults.order,
+            "order_passes": defaults.order_passes,
+            "order_budget": defaults.order_budget,
+            **job["params"],
+            "collection": job["collection"],
+            "seed": job["seed"],
+        }
+    )
+    return render_index(job_args, job["index"])
 
-        # Increase the thickness for the next line
-        thickness += scale_factor if color_factor < 0.5 else -scale_factor
 
-        # Add the overlay channel
-        img = ImageChops.add(img, overlay_img)
+def spool_worker(args: argparse.Namespace) -> tuple[int, int]:
+    """Generates the images queued in the spool until none are left.
 
-    # Resize to make it smoother
-    img = img.resize(
-        (size // scale_factor, size // scale_factor), resample=Image.ANTIALIAS
+    Every worker records its images in its own manifest, in the folder of
+    their collection, so --merge can combine them.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            script.
+
+    Returns:
+        tuple[int, int]: How many images this worker finished and failed.
+    """
+
+    spool: Spool = Spool(args.spool)
+
+    def record(job: dict[str, Any], entry: dict[str, Any]) -> None:
+        Manifest(
+            os.path.join(
+                "output", job["collection"], f"manifest-{spool.worker}.jsonl"
+            )
+        ).record(entry)
+        report_ordering(entry)
+
+    return run_spool_worker(
+        spool, lambda job: render_job(args, job), args.lease, on_done=record
     )
 
-    # Save the image
-    img.save(img_path)
+
+def render_png(args: argparse.Namespace) -> bytes:
+    """Generates one image of a collection as PNG bytes, without saving it.
+
+    Args:
+        args (argparse.Namespace): Parameters of the image, with the index of
+            the image in the collection as args.index.
+
+    Returns:
+        bytes: The image, PNG encoded.
+    """
+
+    buffer: io.BytesIO = io.BytesIO()
+    write_image(buffer, ArtParams.from_args(args), image_rng(args.seed, args.index))
+    return buffer.getvalue()
+
+
+def pipeline_stages(args: argparse.Namespace) -> list[Stage]:
+    """Splits generating an image into stages that can overlap.
+
+    Renderers that draw in bands are compressed while they draw, like
+    everywhere else, so they give the same PNG bytes as the other ways of
+    running a batch and never hold the whole image. Their PNG is ready once
+    the drawing stage is done, and the encoding stage passes it on.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            script.
+
+    Returns:
+        list[Stage]: Point generation, drawing, PNG encoding and writing.
+    """
+
+    output_dir: str = os.path.join("output", args.collection)
+    os.makedirs(output_dir, exist_ok=True)
+    params: ArtParams = ArtParams.from_args(args)
+    renderer: RendererInterface = make_renderer(params)
+    orderings: dict[int, Ordering] = {}
+
+    def generate(index: int) -> tuple[int, float, Optional[Sketch]]:
+        started: float = time.perf_counter()
+        if params.stream:
+            # The points are generated while they're drawn
+            return index, started, None
+        drawing: Sketch = sketch(params, image_rng(args.seed, index))
+        if drawing.ordering is not None:
+            orderings[index] = drawing.ordering
+        return index, started, drawing
+
+    def draw(
+        sketched: tuple[int, float, Optional[Sketch]]
+    ) -> tuple[int, float, Union[Image.Image, bytes]]:
+        index, started, drawing = sketched
+        rng: Optional[np.random.Generator] = (
+            image_rng(args.seed, index) if drawing is None else None
+        )
+        if isinstance(renderer, StreamingRendererInterface) and not params.stream:
+            buffer: io.BytesIO = io.BytesIO()
+            write_image(buffer, params, rng, renderer, drawing)
+            return index, started, buffer.getvalue()
+        return index, started, render(params, rng, renderer, drawing)
+
+    def encode(
+        drawn: tuple[int, float, Union[Image.Image, bytes]]
+    ) -> tuple[int, float, bytes]:
+        index, started, img = drawn
+        if isinstance(img, bytes):
+            return index, started, img
+        return index, started, encode_png(img)
+
+    def write(encoded: tuple[int, float, bytes]) -> dict[str, Any]:
+        index, started, data = encoded
+        img_path: str = os.path.join(
+            output_dir, f"{args.collection}_img_{index}.png"
+        )
+        sha256: str = write_atomic(img_path, data)
+        return manifest_entry(
+            args,
+            index,
+            sha256,
+            time.perf_counter() - started,
+            orderings.pop(index, None),
+        )
+
+    return [
+        Stage("generating points", generate),
+        Stage("drawing", draw),
+        Stage("encoding", encode),
+        Stage("writing", write),
+    ]
 
 
 if __name__ == "__main__":
     args: argparse.Namespace = parse_args()
 
-    for i in range(args.count):
-        point_generator: PointGeneratorInterface = RandPointGenerator(args)
-        #  point_generator: PointGeneratorInterface = LovePointGenerator(args)
-        print(f"Generating image... ({i + 1}/{args.count})")
-        generate_art(
-            collection=args.collection,
-            name=f"{args.collection}_img_{i}",
-            target_size=args.size,
-            scale_factor=args.scale_factor,
-            num_points=args.num_points,
-            point_generator=point_generator,
+    # Answer render requests until interrupted
+    if args.serve is not None:
+        serve(
+            args.serve,
+            render_png,
+            args,
+            args.workers,
+            args.max_concurrent or 2 * max(args.workers, 1),
+            args.render_timeout,
+        )
+        sys.exit(0)
+
+    output_dir: str = os.path.join("output", args.collection)
+
+    # Only combine the manifests of the nodes that made the collection
+    if args.merge:
+        missing, duplicates = merge_manifests(output_dir, args.count)
+        print(f"Merged manifests into {os.path.join(output_dir, 'index.jsonl')}")
+        if missing:
+            print(f"{len(missing)} image(s) missing: {missing}", file=sys.stderr)
+        for index, names in sorted(duplicates.items()):
+            print(f"Image {index} is in {', '.join(names)}", file=sys.stderr)
+        sys.exit(1 if missing or duplicates else 0)
+
+    # Queue the images for the render farm
+    if args.spool is not None and args.submit:
+        try:
+            queued: int = Spool(args.spool).submit(
+                {
+                    f"{args.collection}_img_{index}.json": {
+                        "collection": args.collection,
+                        "index": index,
+                        "seed": args.seed,
+                        "params": image_params(args),
+                    }
+                    for index in shard_indices(
+                        args.count, args.shard, args.index_range
+                    )
+                }
+            )
+        except ValueError as error:
+            # Another seed or other parameters for images that were queued
+            print(f"{error}; use another --collection or --spool", file=sys.stderr)
+            sys.exit(1)
+        print(f"Queued {queued} image(s) in {args.spool}")
+        sys.exit(0)
+
+    # Work on the queued images until there are none left
+    if args.spool is not None:
+        results: list[tuple[int, int]]
+        if args.workers <= 1:
+            results = [spool_worker(args)]
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                results = list(pool.map(spool_worker, [args] * args.workers))
+        failures: int = sum(failed for _, failed in results)
+        print(
+            f"Generated {sum(done for done, _ in results)} image(s), "
+            f"{failures} failed; spool now has "
+            + ", ".join(
+                f"{n} {state}" for state, n in Spool(args.spool).counts().items()
+            )
+        )
+        sys.exit(1 if failures else 0)
+
+    # Skip the images a previous run already finished
+    manifest: Manifest = Manifest(
+        os.path.join(output_dir, manifest_name(args.shard, args.index_range))
+    )
+    indices: list[int] = shard_indices(args.count, args.shard, args.index_range)
+    if args.resume:
+        finished: set[int] = manifest.finished(args.seed, image_params(args))
+        print(f"Resuming: {len(finished)} image(s) already done")
+        indices = [i for i in indices if i not in finished]
+    else:
+        manifest.reset()
+
+    def record(index: int, entry: dict[str, Any]) -> None:
+        manifest.record(entry)
+        report_ordering(entry)
+
+    failed: list[int]
+    if args.pipeline:
+        failed = run_pipeline(
+            indices, pipeline_stages(args), args.queue_depth, on_done=record
         )
+    else:
+        failed = run_pool(args, render_index, indices, args.workers, on_done=record)
+    if failed:
+        print(f"{len(failed)} image(s) failed: {failed}", file=sys.stderr)
+        sys.exit(1)
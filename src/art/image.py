@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import copy
+from typing import BinaryIO, Callable, Iterator, NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+
+from src.colors.generator import rand_color
+from src.points.bounds import Bounds
+from src.points.buffer import PointBuffer
+from src.points.generator import GENERATORS, PointGeneratorInterface
+from src.points.order import Ordering, order_points
+from src.render.renderer import (
+    ChunkedRendererInterface,
+    RendererInterface,
+    StreamingRendererInterface,
+    make_renderer,
+)
+from src.util.files import HashingWriter, atomic_open
+from src.util.png import write_png
+
+# How many points to generate at a time
+POINT_CHUNK: int = 1 << 16
+
+
+class ArtParams(NamedTuple):
+    """Class to represent everything that decides how an image is drawn.
+
+    It has the same fields (and defaults) as the script's arguments, so it
+    can be passed wherever those are read, like the point generators and
+    make_renderer.
+
+    Attributes:
+        size (int): Square size of the image (in pixels).
+        scale_factor (int): How big to make the scaled-up version (for
+            antialiasing).
+        margin (float): How much space to leave blank around the image.
+        num_points (int): How many points to generate.
+        generator (str): Name of the point generator, from GENERATORS.
+        renderer (str): Name of the renderer, from RENDERERS.
+        resample (str): Filter used to shrink the supersampled image.
+        tile_size (int): Size of the tiles used by the tiled renderer.
+        threads (int): How many tiles the tiled renderer draws at once.
+        stream (bool): Whether to draw the points as they're generated,
+            instead of keeping them all in memory.
+        order (bool): Whether to reorder the points into a short path before
+            drawing them.
+        order_passes (int): Most passes to make over the path to shorten it.
+        order_budget (float): Most seconds to spend shortening the path.
+    """
+
+    size: int = 720
+    scale_factor: int = 2
+    margin: float = 0.1
+    num_points: int = 10
+    generator: str = "random"
+    renderer: str = "overlay"
+    resample: str = "lanczos"
+    tile_size: int = 512
+    threads: int = 1
+    stream: bool = False
+    order: bool = False
+    order_passes: int = 2
+    order_budget: float = 2.0
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "ArtParams":
+        """Picks the parameters out of the script's arguments.
+
+        Args:
+            args (argparse.Namespace): Namespace of the arguments passed to
+                the script.
+
+        Returns:
+            ArtParams: Parameters of the images.
+        """
+
+        return cls(**{field: getattr(args, field) for field in cls._fields})
+
+
+class Sketch(NamedTuple):
+    """Class to represent an image before it's drawn.
+
+    Attributes:
+        points (PointBuffer): Centered points, in supersampled pixels.
+        start_color (tuple[int, int, int]): Color of the first line.
+        end_color (tuple[int, int, int]): Color the lines fade into.
+        ordering (Optional[Ordering]): How the points were reordered, if
+            they were.
+    """
+
+    points: PointBuffer
+    start_color: tuple[int, int, int]
+    end_color: tuple[int, int, int]
+    ordering: Optional[Ordering] = None
+
+
+def point_chunks(
+    num_points: int, point_generator: PointGeneratorInterface
+) -> Iterator[np.ndarray]:
+    """Generates the points POINT_CHUNK at a time.
+
+    Args:
+        num_points (int): Number of points to generate.
+        point_generator (PointGeneratorInterface): Used to generate points.
+
+    Yields:
+        np.ndarray: (n, 2) array of the next points.
+    """
+
+    for start in range(0, num_points, POINT_CHUNK):
+        yield point_generator.generate_batch(min(POINT_CHUNK, num_points - start))
+
+
+def generate_points(
+    target_size: int,
+    scale_factor: int,
+    num_points: int,
+    point_generator: PointGeneratorInterface,
+) -> PointBuffer:
+    """Generates the points and centers them on the canvas.
+
+    Args:
+        target_size (int): Size of the image.
+        scale_factor (int): Scaling for antialiasing.
+        num_points (int): Number of points to generate.
+        point_generator (PointGeneratorInterface): Used to generate points.
+
+    Returns:
+        PointBuffer: Centered points, in supersampled pixels.
+    """
+
+    # Parameters
+    size: int = target_size * scale_factor
+    points: PointBuffer = PointBuffer(
+        np.empty(num_points, dtype=np.int64), np.empty(num_points, dtype=np.int64)
+    )
+
+    # Generate the points a chunk at a time, measuring each while it's fresh
+    bounds: Bounds = Bounds()
+    start: int = 0
+    for chunk in point_chunks(num_points, point_generator):
+        stop: int = start + len(chunk)
+        points.x[start:stop] = chunk[:, 0]
+        points.y[start:stop] = chunk[:, 1]
+        bounds.update(points.x[start:stop], points.y[start:stop])
+        start = stop
+
+    # Center the image within the bounding box
+    return points.translate(*bounds.centering(size))
+
+
+def stream_points(
+    target_size: int,
+    scale_factor: int,
+    num_points: int,
+    make_generator: Callable[[], PointGeneratorInterface],
+) -> Iterator[PointBuffer]:
+    """Generates centered points a chunk at a time, without keeping them.
+
+    The points have to be centered before the first one is drawn, so they
+    are generated twice: once just to measure them, a chunk at a time, and
+    again to draw them. Generating is quick next to drawing, and it centers
+    the image exactly like generate_points does.
+
+    Args:
+        target_size (int): Size of the image.
+        scale_factor (int): Scaling for antialiasing.
+        num_points (int): Number of points to generate.
+        make_generator (Callable[[], PointGeneratorInterface]): Makes a
+            generator; every one it makes must give the same points.
+
+    Yields:
+        PointBuffer: The next centered points, in supersampled pixels.
+    """
+
+    size: int = target_size * scale_factor
+    bounds: Bounds = Bounds()
+    for chunk in point_chunks(num_points, make_generator()):
+        bounds.update(chunk[:, 0], chunk[:, 1])
+    dx, dy = bounds.centering(size)
+
+    for chunk in point_chunks(num_points, make_generator()):
+        yield PointBuffer.from_array(chunk).translate(dx, dy)
+
+
+def sketch(params: ArtParams, rng: Optional[np.random.Generator] = None) -> Sketch:
+    """Picks the colors and points of an image.
+
+    Args:
+        params (ArtParams): How to draw the image.
+        rng (Optional[np.random.Generator]): Source of randomness.
+            Default: a freshly seeded generator.
+
+    Returns:
+        Sketch: Points and colors of the image.
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # The colors come first, so a seed gives the same image as it always has
+    start_color: tuple[int, int, int] = rand_color(rng)
+    end_color: tuple[int, int, int] = rand_color(rng)
+    points: PointBuffer = generate_points(
+        params.size,
+        params.scale_factor,
+        params.num_points,
+        GENERATORS[params.generator](params, rng),
+    )
+    ordering: Optional[Ordering] = None
+    if params.order:
+        ordering = order_points(points, params.order_passes, params.order_budget)
+        points = PointBuffer(points.x[ordering.order], points.y[ordering.order])
+    return Sketch(points, start_color, end_color, ordering)
+
+
+def render(
+    params: ArtParams,
+    rng: Optional[np.random.Generator] = None,
+    renderer: Optional[RendererInterface] = None,
+    drawing: Optional[Sketch] = None,
+) -> Image.Image:
+    """Draws an image in memory.
+
+    Args:
+        params (ArtParams): How to draw the image.
+        rng (Optional[np.random.Generator]): Source of randomness.
+            Default: a freshly seeded generator.
+        renderer (Optional[RendererInterface]): Used to draw the lines, so
+            one can be reused between images. Default: the one params picks.
+        drawing (Optional[Sketch]): Points and colors already picked with
+            sketch, to draw instead of picking new ones from rng.
+
+    Returns:
+        Image.Image: The image, at its final size.
+    """
+
+    if renderer is None:
+        renderer = make_renderer(params)
+    if params.stream and drawing is None:
+        return render_stream(params, rng, renderer)
+    if drawing is None:
+        drawing = sketch(params, rng)
+    return renderer.render(
+        drawing.points,
+        drawing.start_color,
+        drawing.end_color,
+        params.size,
+        params.scale_factor,
+    )
+
+
+def render_stream(
+    params: ArtParams,
+    rng: Optional[np.random.Generator],
+    renderer: RendererInterface,
+) -> Image.Image:
+    """Draws an image while its points are generated, in bounded memory.
+
+    Args:
+        params (ArtParams): How to draw the image.
+        rng (Optional[np.random.Generator]): Source of randomness.
+            Default: a freshly seeded generator.
+        renderer (RendererInterface): Used to draw the lines.
+
+    Raises:
+        ValueError: If the renderer can't draw points a chunk at a time, or
+            the points are to be reordered.
+
+    Returns:
+        Image.Image: The image, at its final size.
+    """
+
+    if not isinstance(renderer, ChunkedRendererInterface):
+        raise ValueError(f"The {params.renderer} renderer can't stream points")
+    if params.order:
+        raise ValueError("Streamed points can't be reordered")
+    if rng is None:
+        rng = np.random.default_rng()
+
+    start_color: tuple[int, int, int] = rand_color(rng)
+    end_color: tuple[int, int, int] = rand_color(rng)
+
+    # Generators made from copies of the same state give the same points
+    state: np.random.Generator = copy.deepcopy(rng)
+    chunks: Iterator[PointBuffer] = stream_points(
+        params.size,
+        params.scale_factor,
+        params.num_points,
+        lambda: GENERATORS[params.generator](params, copy.deepcopy(state)),
+    )
+    return renderer.render_chunks(
+        chunks,
+        params.num_points,
+        start_color,
+        end_color,
+        params.size,
+        params.scale_factor,
+    )
+
+
+def write_image(
+    file: BinaryIO,
+    params: ArtParams,
+    rng: Optional[np.random.Generator] = None,
+    renderer: Optional[RendererInterface] = None,
+    drawing: Optional[Sketch] = None,
+) -> None:
+    """Draws an image and writes it as a PNG to a file-like object.
+
+    Renderers that draw in bands are compressed as they go, so the whole
+    image never has to be in memory. Streamed images are drawn whole.
+
+    Args:
+        file (BinaryIO): Where to write the PNG (a file, io.BytesIO, a
+            socket's file...). Only its write method is used.
+        params (ArtParams): How to draw the image.
+        rng (Optional[np.random.Generator]): Source of randomness.
+            Default: a freshly seeded generator.
+        renderer (Optional[RendererInterface]): Used to draw the lines.
+            Default: the one params picks.
+        drawing (Optional[Sketch]): Points and colors already picked with
+            sketch, to draw instead of picking new ones from rng.
+    """
+
+    if renderer is None:
+        renderer = make_renderer(params)
+    if isinstance(renderer, StreamingRendererInterface) and not params.stream:
+        if drawing is None:
+            drawing = sketch(params, rng)
+        bands: Iterator[np.ndarray] = renderer.render_bands(
+            drawing.points,
+            drawing.start_color,
+            drawing.end_color,
+            params.size,
+            params.scale_factor,
+        )
+        write_png(file, params.size, params.size, bands)
+    else:
+        render(params, rng, renderer, drawing).save(file, format="PNG")
+
+
+def save_image(
+    path: str,
+    params: ArtParams,
+    rng: Optional[np.random.Generator] = None,
+    renderer: Optional[RendererInterface] = None,
+    drawing: Optional[Sketch] = None,
+) -> str:
+    """Draws an image and saves it as a PNG.
+
+    The image only appears at its path once it's completely written.
+
+    Args:
+        path (str): Where to save the image.
+        params (ArtParams): How to draw the image.
+        rng (Optional[np.random.Generator]): Source of randomness.
+            Default: a freshly seeded generator.
+        renderer (Optional[RendererInterface]): Used to draw the lines.
+            Default: the one params picks.
+        drawing (Optional[Sketch]): Points and colors already picked with
+            sketch, to draw instead of picking new ones from rng.
+
+    Returns:
+        str: SHA-256 of the saved PNG, in hex.
+    """
+
+    with atomic_open(path) as file:
+        writer: HashingWriter = HashingWriter(file)
+        write_image(writer, params, rng, renderer, drawing)
+    return writer.hexdigest()
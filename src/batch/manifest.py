@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import glob
+import json
+import os
+from typing import Any, Optional
+
+from src.util.files import write_atomic
+
+
+class Manifest:
+    """Class to keep track of the finished images of a collection.
+
+    The manifest is a JSON lines file with one entry per finished image
+    (index, seed, parameters, hash of the PNG, render time...). Entries are
+    only ever appended, so a crash can at worst cut off the last line, which
+    is ignored when loading.
+
+    Attributes:
+        path (str): Where the manifest is stored.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+
+    def load(self) -> dict[int, dict[str, Any]]:
+        """Reads the finished images.
+
+        Returns:
+            dict[int, dict[str, Any]]: Latest entry for each finished index.
+        """
+
+        entries: dict[int, dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry: dict[str, Any] = json.loads(line)
+                except json.JSONDecodeError:
+                    # Cut off by a crash
+                    continue
+                entries[entry["index"]] = entry
+        return entries
+
+    def finished(self, seed: Optional[int], params: dict[str, Any]) -> set[int]:
+        """Finds the images that were made with the same seed and parameters.
+
+        Args:
+            seed (Optional[int]): Seed of the collection.
+            params (dict[str, Any]): Parameters of the images.
+
+        Returns:
+            set[int]: Indices that don't need to be made again.
+        """
+
+        return {
+            index
+            for index, entry in self.load().items()
+            if entry.get("seed") == seed and entry.get("params") == params
+        }
+
+    def reset(self) -> None:
+        """Forgets every finished image."""
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        open(self.path, "w", encoding="utf-8").close()
+
+    def record(self, entry: dict[str, Any]) -> None:
+        """Adds a finished image, and makes sure it reached the disk.
+
+        Args:
+            entry (dict[str, Any]): What to remember about the image. Must
+                have an "index".
+        """
+
+        line: bytes = (json.dumps(entry, sort_keys=True) + "\n").encode("utf-8")
+        with open(self.path, "ab+") as file:
+            # Don't glue the entry onto a line a crash cut off
+            if file.seek(0, os.SEEK_END) > 0:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    line = b"\n" + line
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def merge_manifests(
+    directory: str, count: int, index_name: str = "index.jsonl"
+) -> tuple[list[int], dict[int, list[str]]]:
+    """Combines the manifests of every slice of a collection into one index.
+
+    Args:
+        directory (str): Folder of the collection, holding manifest*.jsonl.
+        count (int): How many images the whole collection has.
+        index_name (str): File name of the combined index, written to the
+            same folder with one entry per image, sorted by index.
+
+    Returns:
+        tuple[list[int], dict[int, list[str]]]: Indices no manifest has, and
+            the indices more than one manifest has, with the manifests that
+            have them.
+    """
+
+    entries: dict[int, dict[str, Any]] = {}
+    sources: dict[int, list[str]] = {}
+    for path in sorted(glob.glob(os.path.join(directory, "manifest*.jsonl"))):
+        for index, entry in Manifest(path).load().items():
+            sources.setdefault(index, []).append(os.path.basename(path))
+            entries.setdefault(index, entry)
+
+    os.makedirs(directory, exist_ok=True)
+    lines: list[str] = [
+        json.dumps(entries[index], sort_keys=True) + "\n" for index in sorted(entries)
+    ]
+    write_atomic(os.path.join(directory, index_name), "".join(lines).encode("utf-8"))
+
+    missing: list[int] = [index for index in range(count) if index not in entries]
+    duplicates: dict[int, list[str]] = {
+        index: names for index, names in sources.items() if len(names) > 1
+    }
+    return missing, duplicates
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+import queue
+import sys
+import threading
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+# Tells the next stage that nothing else is coming
+_DONE: object = object()
+
+
+class Stage(NamedTuple):
+    """Class to represent one step of the pipeline.
+
+    Attributes:
+        name (str): Name of the step, used when reporting failures.
+        func (Callable[[Any], Any]): Turns the previous step's result into
+            this step's result. The first step gets the image index.
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+
+
+def run_pipeline(
+    indices: list[int],
+    stages: list[Stage],
+    depth: int,
+    on_done: Optional[Callable[[int, Any], None]] = None,
+) -> list[int]:
+    """Pushes every image index through a chain of stages.
+
+    Each stage runs in its own thread and hands its results to the next one
+    through a queue that holds at most depth images, so different images can
+    be in different stages at the same time (say, one being drawn while the
+    last one is compressed and the one before that is written), and the
+    slowest stage sets the pace. Stages that spend their time in C code or
+    I/O (NumPy, Pillow, zlib, writes) release the GIL and really overlap.
+
+    Args:
+        indices (list[int]): Image indices to push through, in order.
+        stages (list[Stage]): Steps to apply, in order.
+        depth (int): How many images can wait between two stages. Bounds
+            the memory held by the pipeline.
+        on_done (Optional[Callable[[int, Any], None]]): Called with the index
+            and the last stage's result for every image that succeeds.
+
+    Returns:
+        list[int]: Indices of the images that failed, sorted.
+    """
+
+    total: int = len(indices)
+    done: int = 0
+    failed: list[int] = []
+    lock: threading.Lock = threading.Lock()
+    queues: list[queue.Queue] = [
+        queue.Queue(maxsize=depth) for _ in range(len(stages) - 1)
+    ]
+
+    def report(
+        index: int, result: Any, stage: Optional[Stage], error: Optional[Exception]
+    ) -> None:
+        nonlocal done
+        with lock:
+            done += 1
+            if stage is None:
+                print(f"Generated image {index}... ({done}/{total})")
+                if on_done is not None:
+                    on_done(index, result)
+            else:
+                print(
+                    f"Image {index} failed while {stage.name}: {error!r}",
+                    file=sys.stderr,
+                )
+                failed.append(index)
+
+    def work(k: int) -> None:
+        inbound: Iterator[tuple[int, Any]] = (
+            ((index, index) for index in indices)
+            if k == 0
+            else iter(queues[k - 1].get, _DONE)
+        )
+        last: bool = k == len(stages) - 1
+        try:
+            for index, value in inbound:
+                try:
+                    result: Any = stages[k].func(value)
+                except Exception as error:
+                    report(index, None, stages[k], error)
+                    continue
+                if last:
+                    report(index, result, None, None)
+                else:
+                    queues[k].put((index, result))
+        except BaseException:
+            # Keep the earlier stages from blocking on a queue nobody empties
+            for _ in inbound:
+                pass
+            raise
+        finally:
+            if not last:
+                queues[k].put(_DONE)
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=work, args=(k,), name=stage.name, daemon=True)
+        for k, stage in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sorted(failed)
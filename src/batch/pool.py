@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+
+def run_pool(
+    args: argparse.Namespace,
+    render: Callable[[argparse.Namespace, int], Any],
+    indices: list[int],
+    workers: int,
+    on_done: Optional[Callable[[int, Any], None]] = None,
+) -> list[int]:
+    """Renders every image index, spread over a pool of processes.
+
+    Each worker process calls render(args, index) for the indices it gets,
+    so it builds its own point generator and renderer. A failing image is
+    reported and skipped. If a worker dies outright (which breaks the whole
+    pool), the images that were in flight are retried one at a time on their
+    own, so only the one that kills its worker is marked as failed, and the
+    rest of the batch carries on in a new pool.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            script.
+        render (Callable[[argparse.Namespace, int], Any]): Renders and saves
+            one image. Must be picklable (a module level function).
+        indices (list[int]): Image indices to render.
+        workers (int): How many processes to use. With 1, the images are
+            rendered one after another in this process.
+        on_done (Optional[Callable[[int, Any], None]]): Called in this
+            process with the index and what render returned, for every image
+            that succeeds.
+
+    Returns:
+        list[int]: Indices of the images that failed, sorted.
+    """
+
+    total: int = len(indices)
+    done: int = 0
+    failed: list[int] = []
+
+    def report(index: int, result: Any, error: Optional[BaseException]) -> None:
+        nonlocal done
+        done += 1
+        if error is None:
+            print(f"Generated image {index}... ({done}/{total})")
+            if on_done is not None:
+                on_done(index, result)
+        else:
+            print(f"Image {index} failed: {error!r}", file=sys.stderr)
+            failed.append(index)
+
+    if workers <= 1:
+        for index in indices:
+            print(f"Generating image... ({done + 1}/{total})")
+            try:
+                result: Any = render(args, index)
+            except Exception as error:
+                print(f"Image {index} failed: {error!r}", file=sys.stderr)
+                failed.append(index)
+            else:
+                if on_done is not None:
+                    on_done(index, result)
+            done += 1
+        return failed
+
+    queue: deque[int] = deque(indices)
+    while queue:
+        suspects: list[int] = _drain(args, render, queue, workers, report)
+
+        # Find out which of the images in flight took the pool down
+        for index in suspects:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                try:
+                    result = pool.submit(render, args, index).result()
+                except Exception as error:
+                    report(index, None, error)
+                else:
+                    report(index, result, None)
+
+    return sorted(failed)
+
+
+def _drain(
+    args: argparse.Namespace,
+    render: Callable[[argparse.Namespace, int], Any],
+    queue: deque[int],
+    workers: int,
+    report: Callable[[int, Any, Optional[BaseException]], None],
+) -> list[int]:
+    """Renders the queued indices on one pool until it's empty or breaks.
+
+    Only a couple of images per worker are submitted at a time, so if the
+    pool breaks the images that might be responsible are known.
+
+    Returns:
+        list[int]: Indices that were in flight when the pool broke, if it did.
+    """
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight: dict[Future, int] = {}
+        while queue or in_flight:
+            while queue and len(in_flight) < 2 * workers:
+                index: int = queue.popleft()
+                in_flight[pool.submit(render, args, index)] = index
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    result: Any = future.result()
+                except BrokenProcessPool:
+                    print("A worker died, retrying its images", file=sys.stderr)
+                    return sorted(in_flight.values())
+                except Exception as error:
+                    report(in_flight.pop(future), None, error)
+                else:
+                    report(in_flight.pop(future), result, None)
+    return []
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+from typing import Optional
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """Reads a shard given as 'K/N' (the K-th of N shards, counting from 0).
+
+    Args:
+        text (str): Shard passed to the script.
+
+    Returns:
+        tuple[int, int]: (K, N).
+    """
+
+    try:
+        k, n = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected K/N, got '{text}'")
+    if n < 1 or not 0 <= k < n:
+        raise argparse.ArgumentTypeError(f"expected 0 <= K < N, got '{text}'")
+    return k, n
+
+
+def parse_index_range(text: str) -> tuple[int, int]:
+    """Reads a range of image indices given as 'a:b' (a included, b not).
+
+    Args:
+        text (str): Range passed to the script.
+
+    Returns:
+        tuple[int, int]: (a, b).
+    """
+
+    try:
+        start, stop = (int(part) for part in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a:b, got '{text}'")
+    if not 0 <= start <= stop:
+        raise argparse.ArgumentTypeError(f"expected 0 <= a <= b, got '{text}'")
+    return start, stop
+
+
+def shard_indices(
+    count: int,
+    shard: Optional[tuple[int, int]] = None,
+    index_range: Optional[tuple[int, int]] = None,
+) -> list[int]:
+    """Picks the image indices this node should generate.
+
+    Shards take every N-th index (starting at K) rather than a contiguous
+    block, so slow and quick images are spread evenly between the nodes.
+
+    Args:
+        count (int): How many images the whole collection has.
+        shard (Optional[tuple[int, int]]): (K, N), from parse_shard.
+        index_range (Optional[tuple[int, int]]): (a, b), from
+            parse_index_range.
+
+    Returns:
+        list[int]: Indices to generate, in order.
+    """
+
+    start, stop = index_range if index_range is not None else (0, count)
+    indices: range = range(start, min(stop, count))
+    if shard is not None:
+        k, n = shard
+        return [i for i in indices if i % n == k]
+    return list(indices)
+
+
+def manifest_name(
+    shard: Optional[tuple[int, int]] = None,
+    index_range: Optional[tuple[int, int]] = None,
+) -> str:
+    """Names the manifest of a slice of the collection.
+
+    Each node appends only to its own manifest, so nodes sharing a directory
+    never write to the same file.
+
+    Args:
+        shard (Optional[tuple[int, int]]): (K, N), from parse_shard.
+        index_range (Optional[tuple[int, int]]): (a, b), from
+            parse_index_range.
+
+    Returns:
+        str: File name of the manifest.
+    """
+
+    name: str = "manifest"
+    if index_range is not None:
+        name += f"-range-{index_range[0]}-{index_range[1]}"
+    if shard is not None:
+        name += f"-shard-{shard[0]}-of-{shard[1]}"
+    return f"{name}.jsonl"
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import socket
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+from src.util.files import write_atomic
+
+# Separates the job's file name, the worker and the claim time in a claim
+_SEP: str = "@"
+
+
+class Claim:
+    """Class to represent a job a worker has taken out of the spool.
+
+    Attributes:
+        name (str): File name of the job, as it was queued.
+        path (str): Where the claimed job is stored while it's being worked on.
+        job (dict[str, Any]): Job descriptor.
+    """
+
+    def __init__(self, name: str, path: str, job: dict[str, Any]) -> None:
+        self.name: str = name
+        self.path: str = path
+        self.job: dict[str, Any] = job
+
+
+class Spool:
+    """Class to hand out jobs through a directory, to any number of workers.
+
+    Jobs are JSON files that move between four folders: pending, claimed,
+    done and failed. A worker claims a job by renaming it from pending into
+    claimed, which only one worker can do, since a rename is atomic (also on
+    NFS). The claim's name records who took it and when, so a claim that's
+    older than the lease (its worker crashed or got killed) can be put back
+    into pending by anyone. Nothing besides the directory is needed, so the
+    workers can be on one box or on every host that mounts it.
+
+    Since the lease is checked against the claim time written by another
+    host, it should be much longer than both the slowest job and any clock
+    difference between the hosts.
+
+    Attributes:
+        directory (str): Root of the spool.
+        worker (str): Name of this worker, as recorded in its claims.
+    """
+
+    def __init__(self, directory: str, worker: Optional[str] = None) -> None:
+        self.directory: str = directory
+        self.worker: str = worker or f"{socket.gethostname()}-{os.getpid()}"
+        for folder in ("pending", "claimed", "done", "failed"):
+            os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+    def _path(self, folder: str, name: str = "") -> str:
+        return os.path.join(self.directory, folder, name)
+
+    def names(self, folder: str) -> list[str]:
+        """Lists the jobs in one of the spool's folders.
+
+        Args:
+            folder (str): 'pending', 'claimed', 'done' or 'failed'.
+
+        Returns:
+            list[str]: File names of the jobs, sorted.
+        """
+
+        # Skip the temporary files of writes in progress
+        return sorted(
+            name for name in os.listdir(self._path(folder)) if name[0] != "."
+        )
+
+    def submit(self, jobs: dict[str, dict[str, Any]]) -> int:
+        """Queues jobs, unless they're already queued, claimed or done.
+
+        Jobs that failed before are queued again. Nothing is queued when a
+        job that's already queued, claimed or done was described differently
+        (for a collection, made with another seed or other parameters), since
+        its image would otherwise be left as it was.
+
+        Args:
+            jobs (dict[str, dict[str, Any]]): Job descriptor for each unique
+                job name (used as its file name).
+
+        Returns:
+            int: How many jobs were queued.
+
+        Raises:
+            ValueError: If a known job's descriptor differs from the new one.
+        """
+
+        # Where each known job is stored
+        known: dict[str, str] = {
+            name: self._path(folder, name)
+            for folder in ("pending", "done")
+            for name in self.names(folder)
+        }
+        known.update(
+            (claim.rsplit(_SEP, 2)[0], self._path("claimed", claim))
+            for claim in self.names("claimed")
+        )
+        changed: list[str] = [
+            name
+            for name, job in jobs.items()
+            if name in known and not _describes(known[name], job)
+        ]
+        if changed:
+            raise ValueError(
+                f"{len(changed)} job(s) are already in {self.directory} with "
+                f"another descriptor, e.g. {changed[0]}"
+            )
+
+        failed: set[str] = set(self.names("failed"))
+        queued: int = 0
+        for name, job in jobs.items():
+            if name in known:
+                continue
+            if name in failed:
+                os.remove(self._path("failed", name))
+            write_atomic(
+                self._path("pending", name),
+                json.dumps(job, sort_keys=True).encode("utf-8"),
+            )
+            queued += 1
+        return queued
+
+    def claim(self, names: Optional[deque[str]] = None) -> Optional[Claim]:
+        """Takes a pending job, if there's one left.
+
+        Args:
+            names (Optional[deque[str]]): Pending job names to try, in order, so
+                the folder doesn't have to be listed for every claim. Claimed
+                names are removed from it. Default: list the folder.
+
+        Returns:
+            Optional[Claim]: The job, or None if nothing could be claimed.
+        """
+
+        if names is None:
+            names = deque(self.names("pending"))
+        while names:
+            name: str = names.popleft()
+            path: str = self._path(
+                "claimed", _SEP.join((name, self.worker, f"{time.time():.3f}"))
+            )
+            try:
+                os.rename(self._path("pending", name), path)
+            except FileNotFoundError:
+                # Another worker got there first
+                continue
+            with open(path, "r", encoding="utf-8") as file:
+                return Claim(name, path, json.load(file))
+        return None
+
+    def complete(self, claim: Claim, result: dict[str, Any]) -> bool:
+        """Marks a claimed job as done.
+
+        Args:
+            claim (Claim): Job that was worked on.
+            result (dict[str, Any]): What to store about the finished job,
+                next to its descriptor.
+
+        Returns:
+            bool: False if the claim had run out and been given to someone
+                else in the meantime (the job was still done, possibly twice).
+        """
+
+        return self._finish(claim, "done", {**claim.job, "result": result})
+
+    def fail(self, claim: Claim, error: BaseException) -> bool:
+        """Marks a claimed job as failed, so it isn't handed out again.
+
+        Args:
+            claim (Claim): Job that was worked on.
+            error (BaseException): What went wrong.
+
+        Returns:
+            bool: False if the claim had run out and been given to someone
+                else in the meantime.
+        """
+
+        return self._finish(claim, "failed", {**claim.job, "error": repr(error)})
+
+    def _finish(self, claim: Claim, folder: str, result: dict[str, Any]) -> bool:
+        write_atomic(
+            self._path(folder, claim.name),
+            json.dumps(result, sort_keys=True).encode("utf-8"),
+        )
+        try:
+            os.remove(claim.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def requeue_stale(self, lease: float) -> list[str]:
+        """Puts the jobs whose claim is older than the lease back in pending.
+
+        Args:
+            lease (float): How long a worker may keep a job, in seconds.
+
+        Returns:
+            list[str]: Names of the jobs that were put back.
+        """
+
+        requeued: list[str] = []
+        now: float = time.time()
+        for claim in self.names("claimed"):
+            name, worker, claimed_at = claim.rsplit(_SEP, 2)
+            if now - float(claimed_at) <= lease:
+                continue
+            try:
+                os.rename(self._path("claimed", claim), self._path("pending", name))
+            except FileNotFoundError:
+                # Finished or requeued by someone else
+                continue
+            print(f"Requeued {name}, claimed by {worker}", file=sys.stderr)
+            requeued.append(name)
+        return requeued
+
+    def counts(self) -> dict[str, int]:
+        """Counts the jobs in each state.
+
+        Returns:
+            dict[str, int]: Number of pending, claimed, done and failed jobs.
+        """
+
+        return {
+            folder: len(self.names(folder))
+            for folder in ("pending", "claimed", "done", "failed")
+        }
+
+
+def _describes(path: str, job: dict[str, Any]) -> bool:
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            stored: dict[str, Any] = json.load(file)
+    except FileNotFoundError:
+        # Claimed, finished or requeued since the folder was listed
+        return True
+    return all(stored.get(key) == value for key, value in job.items())
+
+
+def run_spool_worker(
+    spool: Spool,
+    render: Callable[[dict[str, Any]], dict[str, Any]],
+    lease: float,
+    poll: float = 1.0,
+    on_done: Optional[Callable[[dict[str, Any], dict[str, Any]], None]] = None,
+) -> tuple[int, int]:
+    """Works through a spool until it has nothing left to hand out.
+
+    When nothing is pending but other workers still hold claims, the worker
+    waits, requeueing claims that outlive the lease, in case one of them was
+    abandoned.
+
+    Args:
+        spool (Spool): Where to get the jobs from.
+        render (Callable[[dict[str, Any]], dict[str, Any]]): Does one job,
+            given its descriptor, and returns what to store about it.
+        lease (float): How long a worker may keep a job, in seconds.
+        poll (float): How long to wait between looks at the other workers'
+            claims, in seconds.
+        on_done (Optional[Callable[[dict[str, Any], dict[str, Any]], None]]):
+            Called with the job and what render returned, for every job that
+            succeeds.
+
+    Returns:
+        tuple[int, int]: How many jobs this worker finished and failed.
+    """
+
+    done: int = 0
+    failed: int = 0
+    names: deque[str] = deque()
+    while True:
+        if not names:
+            names = deque(spool.names("pending"))
+        claim: Optional[Claim] = spool.claim(names)
+        if claim is None:
+            if spool.requeue_stale(lease) or spool.names("pending"):
+                continue
+            if not spool.names("claimed"):
+                return done, failed
+            time.sleep(poll)
+            continue
+
+        try:
+            result: dict[str, Any] = render(claim.job)
+        except Exception as error:
+            print(f"Job {claim.name} failed: {error!r}", file=sys.stderr)
+            spool.fail(claim, error)
+            failed += 1
+            continue
+        if not spool.complete(claim, result):
+            print(f"Job {claim.name} outlived its lease", file=sys.stderr)
+        print(f"Finished {claim.name} ({spool.worker})")
+        if on_done is not None:
+            on_done(claim.job, result)
+        done += 1
@@ -1,17 +1,26 @@
 # -*- coding: utf-8 -*-
 
 import colorsys
-import random
+from typing import Optional
 
+import numpy as np
 
-def rand_color() -> tuple[int, int, int]:
+
+def rand_color(rng: Optional[np.random.Generator] = None) -> tuple[int, int, int]:
     """Generates a random, bright color.
 
+    Args:
+        rng (Optional[np.random.Generator]): Source of randomness.
+            Default: a freshly seeded generator.
+
     Returns:
         tuple[int, int, int]: Random RGB color (values range 0-255).
     """
 
-    h: float = random.random()
+    if rng is None:
+        rng = np.random.default_rng()
+
+    h: float = float(rng.random())
     s: float = 1
     v: float = 1
 
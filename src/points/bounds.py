@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from typing import Optional
+
+import numpy as np
+
+
+class Bounds:
+    """Class to keep track of the bounding box of the points seen so far.
+
+    Points can be added a chunk at a time as they're generated, while each
+    chunk is still in the cache, so finding the box never needs a pass of
+    its own over all the points.
+
+    Attributes:
+        min_x (Optional[int]): Smallest x so far (None before any points).
+        min_y (Optional[int]): Smallest y so far.
+        max_x (Optional[int]): Largest x so far.
+        max_y (Optional[int]): Largest y so far.
+    """
+
+    def __init__(self) -> None:
+        self.min_x: Optional[int] = None
+        self.min_y: Optional[int] = None
+        self.max_x: Optional[int] = None
+        self.max_y: Optional[int] = None
+
+    def update(self, x: np.ndarray, y: np.ndarray) -> None:
+        """Grows the box to hold more points.
+
+        Args:
+            x (np.ndarray): x coordinates of the points.
+            y (np.ndarray): y coordinates of the points.
+        """
+
+        if len(x) == 0:
+            return
+        low_x, high_x = int(x.min()), int(x.max())
+        low_y, high_y = int(y.min()), int(y.max())
+        first: bool = self.min_x is None
+        self.min_x = low_x if first else min(self.min_x, low_x)
+        self.min_y = low_y if first else min(self.min_y, low_y)
+        self.max_x = high_x if first else max(self.max_x, high_x)
+        self.max_y = high_y if first else max(self.max_y, high_y)
+
+    def box(self) -> tuple[int, int, int, int]:
+        """Gives the box holding every point so far.
+
+        Raises:
+            ValueError: If no points were added.
+
+        Returns:
+            tuple[int, int, int, int]: (min_x, min_y, max_x, max_y), all
+                included.
+        """
+
+        if self.min_x is None:
+            raise ValueError("No points to bound")
+        return (self.min_x, self.min_y, self.max_x, self.max_y)
+
+    def centering(self, size: int) -> tuple[int, int]:
+        """Finds how far to move the points to center them on a canvas.
+
+        Args:
+            size (int): Square size of the canvas.
+
+        Returns:
+            tuple[int, int]: How far to move the points right and down.
+        """
+
+        min_x, min_y, max_x, max_y = self.box()
+        delta_x: int = min_x - (size - max_x)
+        delta_y: int = min_y - (size - max_y)
+        return -(delta_x // 2), -(delta_y // 2)
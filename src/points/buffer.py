@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from src.points.bounds import Bounds
+from src.points.point import Point
+
+# How many points to turn into Python ints at a time when iterating
+_ITER_CHUNK: int = 1 << 16
+
+
+class PointBuffer:
+    """Class to store many points as two flat arrays of coordinates.
+
+    A list of Point tuples costs around a hundred bytes per point and a trip
+    through the interpreter for anything done to it. Keeping the x and y
+    coordinates in their own int64 arrays takes 16 bytes per point and lets
+    moving, scaling and measuring the points happen in one NumPy call each.
+    It's what the point generators hand to the renderers.
+
+    Iterating over a buffer still gives Point tuples, for the code that
+    draws one line at a time.
+
+    Attributes:
+        x (np.ndarray): (n,) int64 array of x coordinates.
+        y (np.ndarray): (n,) int64 array of y coordinates.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray) -> None:
+        if len(x) != len(y):
+            raise ValueError(f"Got {len(x)} x and {len(y)} y coordinates")
+        self.x: np.ndarray = np.ascontiguousarray(x, dtype=np.int64)
+        self.y: np.ndarray = np.ascontiguousarray(y, dtype=np.int64)
+
+    @classmethod
+    def from_array(cls, points: np.ndarray) -> "PointBuffer":
+        """Splits an (n, 2) array of points, like generate_batch returns.
+
+        Args:
+            points (np.ndarray): (n, 2) array of x, y coordinates.
+
+        Returns:
+            PointBuffer: The same points.
+        """
+
+        return cls(points[:, 0], points[:, 1])
+
+    @classmethod
+    def from_points(cls, points: Iterable[Point]) -> "PointBuffer":
+        """Packs Point tuples into a buffer.
+
+        Args:
+            points (Iterable[Point]): Points, in order.
+
+        Returns:
+            PointBuffer: The same points.
+        """
+
+        return cls.from_array(np.array(list(points), dtype=np.int64).reshape(-1, 2))
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, index: int) -> Point:
+        return Point(int(self.x[index]), int(self.y[index]))
+
+    def __iter__(self) -> Iterator[Point]:
+        # Convert a chunk at a time, so iterating doesn't copy the whole buffer
+        for start in range(0, len(self), _ITER_CHUNK):
+            stop: int = start + _ITER_CHUNK
+            for x, y in zip(self.x[start:stop].tolist(), self.y[start:stop].tolist()):
+                yield Point(x, y)
+
+    def to_array(self) -> np.ndarray:
+        """Interleaves the coordinates again.
+
+        Returns:
+            np.ndarray: (n, 2) int64 array of x, y coordinates.
+        """
+
+        return np.stack((self.x, self.y), axis=1)
+
+    def translate(self, dx: int, dy: int) -> "PointBuffer":
+        """Moves every point, in place.
+
+        Args:
+            dx (int): How far to move the points right.
+            dy (int): How far to move the points down.
+
+        Returns:
+            PointBuffer: This buffer, to chain calls.
+        """
+
+        self.x += dx
+        self.y += dy
+        return self
+
+    def scale(self, factor: int) -> "PointBuffer":
+        """Multiplies every coordinate, in place.
+
+        Args:
+            factor (int): What to multiply the coordinates by.
+
+        Returns:
+            PointBuffer: This buffer, to chain calls.
+        """
+
+        self.x *= factor
+        self.y *= factor
+        return self
+
+    def bbox(self) -> tuple[int, int, int, int]:
+        """Finds the smallest box holding every point.
+
+        Returns:
+            tuple[int, int, int, int]: (min_x, min_y, max_x, max_y), all
+                included.
+        """
+
+        bounds: Bounds = Bounds()
+        bounds.update(self.x, self.y)
+        return bounds.box()
+
+    def pairs(self) -> Iterator[tuple[Point, Point]]:
+        """Walks the closed loop through the points.
+
+        Yields:
+            tuple[Point, Point]: Each point and the next one, with the last
+                point paired with the first.
+        """
+
+        if not len(self):
+            return
+        points: Iterator[Point] = iter(self)
+        first: Point = next(points)
+        previous: Point = first
+        for point in points:
+            yield previous, point
+            previous = point
+        yield previous, first
+
+    def ends(self) -> np.ndarray:
+        """Lays out the closed loop through the points as an array.
+
+        Returns:
+            np.ndarray: (n, 4) float array of x1, y1, x2, y2 for each line,
+                with the last point connected to the first.
+        """
+
+        ends: np.ndarray = np.empty((len(self), 4), dtype=np.float64)
+        ends[:, 0] = self.x
+        ends[:, 1] = self.y
+        ends[:-1, 2:] = ends[1:, :2]
+        ends[-1, 2:] = ends[0, :2]
+        return ends
@@ -2,10 +2,18 @@
 
 import abc
 import argparse
+import functools
 import math
-import random
+from typing import NamedTuple, Optional
+
+import numpy as np
 
 from src.points.point import Point
+from src.points.poisson import poisson_disk
+from src.points.sequences import halton, r2, sobol
+
+# Most points a heart's trig table is cached for (about 48 bytes a point)
+HEART_TABLE_MAX_POINTS: int = 1 << 20
 
 
 class PointGeneratorInterface(metaclass=abc.ABCMeta):
@@ -21,6 +29,24 @@ class PointGeneratorInterface(metaclass=abc.ABCMeta):
 
         raise NotImplementedError
 
+    def generate_batch(self, n: int) -> np.ndarray:
+        """Generates the next n points at once.
+
+        Generators that can should override this with a vectorized version
+        that gives the same points as n calls to generate.
+
+        Args:
+            n (int): How many points to generate.
+
+        Returns:
+            np.ndarray: (n, 2) int64 array of x, y coordinates.
+        """
+
+        points: np.ndarray = np.empty((n, 2), dtype=np.int64)
+        for i in range(n):
+            points[i] = self.generate()
+        return points
+
 
 class RandPointGenerator(PointGeneratorInterface):
     """Class to generate random points.
@@ -28,19 +54,284 @@ class RandPointGenerator(PointGeneratorInterface):
     Attributes:
         minimum (int): Minimum value for x or y in the point.
         maximum (int): Maximum value for x or y in the point.
+        rng (np.random.Generator): Source of randomness.
     """
 
-    def __init__(self, args: argparse.Namespace) -> None:
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
         super().__init__()
         self.minimum: int = int(args.size * args.scale_factor * args.margin)
         self.maximum: int = int(args.size * args.scale_factor - self.minimum)
+        self.rng: np.random.Generator = (
+            rng if rng is not None else np.random.default_rng()
+        )
 
     def generate(self) -> Point:
         return Point(
-            random.randint(self.minimum, self.maximum),
-            random.randint(self.minimum, self.maximum),
+            int(self.rng.integers(self.minimum, self.maximum, endpoint=True)),
+            int(self.rng.integers(self.minimum, self.maximum, endpoint=True)),
+        )
+
+    def generate_batch(self, n: int) -> np.ndarray:
+        # Drawn row by row, so the coordinates come out in the same order
+        return self.rng.integers(
+            self.minimum, self.maximum, size=(n, 2), endpoint=True, dtype=np.int64
+        )
+
+
+class HeartTable(NamedTuple):
+    """Class to hold the terms of a heart that don't depend on the weights.
+
+    Attributes:
+        t (np.ndarray): (n + 1,) values of t, stepped like generate does.
+        sin3 (np.ndarray): (n,) sin(t) cubed.
+        cos (np.ndarray): (n, 4) cos(t), cos(2t), cos(3t) and cos(4t).
+    """
+
+    t: np.ndarray
+    sin3: np.ndarray
+    cos: np.ndarray
+
+
+def heart_terms(t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Works out the trigonometric terms of a heart.
+
+    Args:
+        t (np.ndarray): (n,) values of t.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (n,) sin(t) cubed and (n, 4) cos(kt)
+            for k from 1 to 4.
+    """
+
+    cos: np.ndarray = np.empty((len(t), 4))
+    for k in range(4):
+        cos[:, k] = np.cos((k + 1) * t)
+    return np.sin(t) ** 3, cos
+
+
+@functools.lru_cache(maxsize=8)
+def heart_table(num_points: int) -> HeartTable:
+    """Works out the terms of a heart of num_points points, once.
+
+    Every heart with the same number of points goes through the same
+    values of t, so only the random weights differ from one to the next.
+
+    Args:
+        num_points (int): How many points the heart has.
+
+    Returns:
+        HeartTable: The terms, read-only, as they're shared.
+    """
+
+    steps: np.ndarray = np.full(num_points + 1, (2 * math.pi) / num_points)
+    steps[0] = 0
+    t: np.ndarray = np.cumsum(steps)
+    table: HeartTable = HeartTable(t, *heart_terms(t[:-1]))
+    for array in table:
+        array.setflags(write=False)
+    return table
+
+
+class PoissonDiskPointGenerator(PointGeneratorInterface):
+    """Class to generate evenly spread random points.
+
+    Unlike RandPointGenerator's, no two points are closer than spacing, so
+    they don't clump and there are no tiny lines wasting time to draw. All
+    the points are scattered when the first are asked for, with a spacing
+    that leaves a few more than num_points, and num_points of them are
+    picked in random order. There are no more points after those.
+
+    Attributes:
+        minimum (int): Minimum value for x or y in the point.
+        maximum (int): Maximum value for x or y in the point.
+        num_points (int): How many points to scatter.
+        spacing (float): Smallest distance between two points, once they're
+            rounded to whole pixels.
+        index (int): How many points have been generated.
+        rng (np.random.Generator): Source of randomness.
+    """
+
+    # Share of the square a point's spacing squared covers, for the spacing
+    # to leave more than num_points (a full packing reaches about 0.7)
+    DENSITY: float = 0.55
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__()
+        self.minimum: int = int(args.size * args.scale_factor * args.margin)
+        self.maximum: int = int(args.size * args.scale_factor - self.minimum)
+        self.num_points: int = args.num_points
+        width: int = self.maximum - self.minimum + 1
+        self.spacing: float = (
+            width * math.sqrt(self.DENSITY / self.num_points) - math.sqrt(2)
+        )
+        self.index: int = 0
+        self.rng: np.random.Generator = (
+            rng if rng is not None else np.random.default_rng()
+        )
+        self._points: Optional[np.ndarray] = None
+
+    def generate(self) -> Point:
+        return Point(*self.generate_batch(1)[0].tolist())
+
+    def generate_batch(self, n: int) -> np.ndarray:
+        if self.index + n > self.num_points:
+            raise ValueError(f"The poisson generator only has {self.num_points} points")
+        if self._points is None:
+            self._points = self._scatter()
+        points: np.ndarray = self._points[self.index : self.index + n]
+        self.index += n
+        return points
+
+    def _scatter(self) -> np.ndarray:
+        """Scatters num_points points inside the margin.
+
+        Rounding a point down to whole pixels moves it less than sqrt(2), so
+        they're scattered that much further apart than spacing, which leaves
+        room for sqrt(2) less than the density allows.
+
+        Raises:
+            ValueError: If the points don't fit a pixel apart.
+
+        Returns:
+            np.ndarray: (num_points, 2) int64 array of x, y coordinates.
+        """
+
+        width: int = self.maximum - self.minimum + 1
+        while True:
+            if self.spacing < 1:
+                raise ValueError(
+                    f"{self.num_points} points don't fit a pixel apart in "
+                    f"{width}x{width} pixels"
+                )
+            points: np.ndarray = poisson_disk(
+                width, self.spacing + math.sqrt(2), self.rng
+            )
+            if len(points) >= self.num_points:
+                break
+            # Too few fitted (it's random, after all), so squeeze them closer
+            self.spacing *= 0.95
+        picked: np.ndarray = self.rng.choice(
+            len(points), self.num_points, replace=False
+        )
+        return np.floor(points[picked]).astype(np.int64) + self.minimum
+
+
+class QuasiRandomPointGenerator(PointGeneratorInterface):
+    """Class to generate points of a low-discrepancy sequence.
+
+    Each point of such a sequence falls in the gaps the ones before it
+    left, so fewer points cover the image as evenly as random ones would.
+    Subclasses give the sequence in the unit square, randomized for each
+    generator so each image still gets its own points, and it's stretched
+    over the space inside the margin.
+
+    Attributes:
+        minimum (int): Minimum value for x or y in the point.
+        maximum (int): Maximum value for x or y in the point.
+        index (int): How many points have been generated.
+        rng (np.random.Generator): Source of randomness.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__()
+        self.minimum: int = int(args.size * args.scale_factor * args.margin)
+        self.maximum: int = int(args.size * args.scale_factor - self.minimum)
+        self.index: int = 0
+        self.rng: np.random.Generator = (
+            rng if rng is not None else np.random.default_rng()
+        )
+
+    @abc.abstractmethod
+    def sequence(self, start: int, n: int) -> np.ndarray:
+        """Gives points of the randomized sequence.
+
+        Args:
+            start (int): Index of the first point.
+            n (int): How many points to give.
+
+        Returns:
+            np.ndarray: (n, 2) floats between 0 and 1.
+        """
+
+        raise NotImplementedError
+
+    def generate(self) -> Point:
+        return Point(*self.generate_batch(1)[0].tolist())
+
+    def generate_batch(self, n: int) -> np.ndarray:
+        unit: np.ndarray = self.sequence(self.index, n)
+        self.index += n
+        width: int = self.maximum - self.minimum + 1
+        return np.floor(unit * width).astype(np.int64) + self.minimum
+
+
+class HaltonPointGenerator(QuasiRandomPointGenerator):
+    """Class to generate points of the Halton sequence in bases 2 and 3.
+
+    The whole sequence is shifted by a random offset, wrapping round the
+    edges (a Cranley-Patterson rotation), which keeps it just as even.
+
+    Attributes:
+        offset (np.ndarray): (2,) shift of each coordinate, from 0 to 1.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        self.offset: np.ndarray = self.rng.random(2)
+
+    def sequence(self, start: int, n: int) -> np.ndarray:
+        return (halton(start, n) + self.offset) % 1
+
+
+class SobolPointGenerator(QuasiRandomPointGenerator):
+    """Class to generate points of the 2D Sobol sequence.
+
+    The coordinates' bits are XORed with random ones (a digital shift),
+    which keeps every block of 2^k points stratified like the original.
+
+    Attributes:
+        shift (tuple[int, int]): Bits each coordinate is XORed with.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        self.shift: tuple[int, int] = tuple(
+            int(bits) for bits in self.rng.integers(0, 1 << 32, size=2)
         )
 
+    def sequence(self, start: int, n: int) -> np.ndarray:
+        return sobol(start, n, self.shift)
+
+
+class R2PointGenerator(QuasiRandomPointGenerator):
+    """Class to generate points of Roberts' R2 sequence.
+
+    The whole sequence is shifted by a random offset, wrapping round the
+    edges, which keeps it just as even.
+
+    Attributes:
+        offset (np.ndarray): (2,) shift of each coordinate, from 0 to 1.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        self.offset: np.ndarray = self.rng.random(2)
+
+    def sequence(self, start: int, n: int) -> np.ndarray:
+        return (r2(start, n) + self.offset) % 1
+
 
 class LovePointGenerator(PointGeneratorInterface):
     """Class to generate points based on a distorted heart.
@@ -50,25 +341,313 @@ class LovePointGenerator(PointGeneratorInterface):
         maximum (int): Maximum value for the image's coordinates.
         t (float): Current value for parametric equation.
         step (float): What to increase t by each generation.
+        num_points (int): How many points make one turn of the heart.
+        index (int): How many points have been generated.
+        rng (np.random.Generator): Source of randomness.
     """
 
-    def __init__(self, args: argparse.Namespace) -> None:
+    # Each weight's share of the y coordinate, subtracted after the first
+    WEIGHTS: tuple[float, ...] = (0.8, 0.6, 0.2, 0.1)
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
         super().__init__()
         self.minimum: int = int(args.size * args.margin)
         self.maximum: int = args.size - self.minimum
         self.t: float = 0
         self.step: float = (2 * math.pi) / args.num_points
+        self.num_points: int = args.num_points
+        self.index: int = 0
+        self.rng: np.random.Generator = (
+            rng if rng is not None else np.random.default_rng()
+        )
 
     def generate(self) -> Point:
         i: float = self.t
         self.t += self.step
+        self.index += 1
         return Point(
             self.maximum - int(self.maximum * pow(math.sin(i), 3)),
             self.maximum
             - int(
-                (0.8 * random.random() * self.maximum * math.cos(i))
-                - (0.6 * random.random() * self.maximum * math.cos(2 * i))
-                - (0.2 * random.random() * self.maximum * math.cos(3 * i))
-                - (0.1 * random.random() * self.maximum * math.cos(4 * i))
+                (0.8 * self.rng.random() * self.maximum * math.cos(i))
+                - (0.6 * self.rng.random() * self.maximum * math.cos(2 * i))
+                - (0.2 * self.rng.random() * self.maximum * math.cos(3 * i))
+                - (0.1 * self.rng.random() * self.maximum * math.cos(4 * i))
             ),
         )
+
+    def generate_batch(self, n: int) -> np.ndarray:
+        start: int = self.index
+        stop: int = start + n
+        self.index = stop
+        sin3: np.ndarray
+        cos: np.ndarray
+        if self.index <= self.num_points <= HEART_TABLE_MAX_POINTS:
+            table: HeartTable = heart_table(self.num_points)
+            self.t = float(table.t[stop])
+            sin3, cos = table.sin3[start:stop], table.cos[start:stop]
+        else:
+            # Step t the same way generate does, so it adds up the same
+            steps: np.ndarray = np.full(n + 1, self.step)
+            steps[0] = self.t
+            t: np.ndarray = np.cumsum(steps)
+            self.t = float(t[-1])
+            sin3, cos = heart_terms(t[:-1])
+
+        # Scale the weights in the same order generate multiplies them
+        terms: np.ndarray = self.rng.random((n, 4))
+        terms *= self.WEIGHTS
+        terms *= self.maximum
+        terms *= cos
+        points: np.ndarray = np.empty((n, 2), dtype=np.int64)
+        points[:, 0] = self.maximum - (self.maximum * sin3).astype(np.int64)
+        points[:, 1] = self.maximum - (
+            terms[:, 0] - terms[:, 1] - terms[:, 2] - terms[:, 3]
+        ).astype(np.int64)
+        return points
+
+
+class ParametricPointGenerator(PointGeneratorInterface):
+    """Class to generate points along a randomly perturbed parametric curve.
+
+    Subclasses give the curve as x(t) and y(t) over a NumPy array of t, and
+    pick its coefficients at random when they're made, so each image gets
+    its own variation of the shape. The num_points points are spread evenly
+    over the turns it takes the curve to close, and each one is also pulled
+    toward the center by up to jitter of the radius. The curve is scaled to
+    fill the space inside the margin.
+
+    Attributes:
+        minimum (int): Minimum value for x or y in the point.
+        maximum (int): Maximum value for x or y in the point.
+        num_points (int): How many points go around the whole curve.
+        index (int): How many points have been generated.
+        turns (int): How many times t goes round 2 pi to close the curve.
+        jitter (float): Most a point can be pulled toward the center, as a
+            fraction of the radius.
+        rng (np.random.Generator): Source of randomness.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__()
+        self.minimum: int = int(args.size * args.scale_factor * args.margin)
+        self.maximum: int = int(args.size * args.scale_factor - self.minimum)
+        self.num_points: int = args.num_points
+        self.index: int = 0
+        self.turns: int = 1
+        self.jitter: float = 0.05
+        self.rng: np.random.Generator = (
+            rng if rng is not None else np.random.default_rng()
+        )
+
+    @abc.abstractmethod
+    def curve(self, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Evaluates the curve.
+
+        Args:
+            t (np.ndarray): (n,) values of t.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (n,) x and y coordinates, between
+                -1 and 1.
+        """
+
+        raise NotImplementedError
+
+    def generate(self) -> Point:
+        return Point(*self.generate_batch(1)[0].tolist())
+
+    def generate_batch(self, n: int) -> np.ndarray:
+        step: float = 2 * math.pi * self.turns / self.num_points
+        t: np.ndarray = np.arange(self.index, self.index + n) * step
+        self.index += n
+        x, y = self.curve(t)
+
+        # Scale the curve to the image, pulling each point in a little
+        center: float = (self.minimum + self.maximum) / 2
+        radius: np.ndarray = (self.maximum - self.minimum) / 2 * (
+            1 - self.jitter * self.rng.random(n)
+        )
+        points: np.ndarray = np.empty((n, 2), dtype=np.int64)
+        points[:, 0] = np.rint(center + radius * x)
+        points[:, 1] = np.rint(center + radius * y)
+        return points
+
+
+class LissajousPointGenerator(ParametricPointGenerator):
+    """Class to generate points along a Lissajous figure.
+
+    x = sin(a t + delta), y = sin(b t).
+
+    Attributes:
+        a (int): Frequency of x, from 1 to 6.
+        b (int): Frequency of y, from 1 to 6.
+        delta (float): Phase of x, from 0 to pi.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        frequencies: np.ndarray = self.rng.integers(1, 6, size=2, endpoint=True)
+        self.a: int = int(frequencies[0])
+        self.b: int = int(frequencies[1])
+        self.delta: float = float(self.rng.uniform(0, math.pi))
+
+    def curve(self, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return np.sin(self.a * t + self.delta), np.sin(self.b * t)
+
+
+class RosePointGenerator(ParametricPointGenerator):
+    """Class to generate points along a rose (rhodonea) curve.
+
+    r = cos(k t), turned by a random angle.
+
+    Attributes:
+        k (int): How many petals (or half as many, when even), from 2 to 9.
+        angle (float): How far the rose is turned.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        self.k: int = int(self.rng.integers(2, 9, endpoint=True))
+        self.angle: float = float(self.rng.uniform(0, 2 * math.pi))
+
+    def curve(self, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        r: np.ndarray = np.cos(self.k * t)
+        return r * np.cos(t + self.angle), r * np.sin(t + self.angle)
+
+
+class HypotrochoidPointGenerator(ParametricPointGenerator):
+    """Class to generate points along a hypotrochoid (a spirograph drawing).
+
+    A circle of radius r rolls inside one of radius R, drawing with a pen d
+    from its center.
+
+    Attributes:
+        big_r (int): Radius R of the fixed circle, from 3 to 10.
+        small_r (int): Radius r of the rolling circle, smaller than R.
+        d (float): Distance of the pen from the rolling circle's center,
+            from 0.3 r to 1.5 r.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        self.big_r: int = int(self.rng.integers(3, 10, endpoint=True))
+        self.small_r: int = int(self.rng.integers(1, self.big_r))
+        self.d: float = float(self.rng.uniform(0.3, 1.5)) * self.small_r
+        # The pen is back where it started once both circles line up again
+        self.turns = self.small_r // math.gcd(self.big_r, self.small_r)
+
+    def curve(self, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        rolling: int = self.big_r - self.small_r
+        reach: float = rolling + self.d
+        spin: np.ndarray = rolling / self.small_r * t
+        return (
+            (rolling * np.cos(t) + self.d * np.cos(spin)) / reach,
+            (rolling * np.sin(t) - self.d * np.sin(spin)) / reach,
+        )
+
+
+class SuperformulaPointGenerator(ParametricPointGenerator):
+    """Class to generate points along Gielis' superformula.
+
+    r = (|cos(m t / 4)|^n2 + |sin(m t / 4)|^n3)^(-1 / n1).
+
+    Attributes:
+        m (int): How many times the shape repeats, from 2 to 8.
+        n1 (float): Overall exponent, from 0.5 to 8.
+        n2 (float): Exponent of the cosine, from 0.5 to 6.
+        n3 (float): Exponent of the sine, from 0.5 to 6.
+        reach (float): Largest radius, which is scaled to the image's.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        self.m: int = int(self.rng.integers(2, 8, endpoint=True))
+        self.n1: float = float(self.rng.uniform(0.5, 8))
+        exponents: np.ndarray = self.rng.uniform(0.5, 6, size=2)
+        self.n2: float = float(exponents[0])
+        self.n3: float = float(exponents[1])
+        # Scale by the furthest the curve gets, so it fills the image
+        self.reach: float = float(
+            self.radius(np.linspace(0, 2 * math.pi, 4096)).max()
+        )
+
+    def radius(self, t: np.ndarray) -> np.ndarray:
+        """Works out the superformula's radius.
+
+        Args:
+            t (np.ndarray): (n,) values of t.
+
+        Returns:
+            np.ndarray: (n,) radii.
+        """
+
+        angle: np.ndarray = self.m * t / 4
+        return (
+            np.abs(np.cos(angle)) ** self.n2 + np.abs(np.sin(angle)) ** self.n3
+        ) ** (-1 / self.n1)
+
+    def curve(self, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        r: np.ndarray = np.minimum(self.radius(t) / self.reach, 1)
+        return r * np.cos(t), r * np.sin(t)
+
+
+class HeartPointGenerator(ParametricPointGenerator):
+    """Class to generate points along a heart with randomly weighted terms.
+
+    The classic heart, x = 16 sin^3 t and
+    y = 13 cos t - 5 cos 2t - 2 cos 3t - cos 4t. Unlike love, the weights
+    are picked once per image rather than once per point, and the points
+    are jittered toward the center instead.
+
+    Attributes:
+        weights (np.ndarray): Weights of the four terms of y, each scaled by
+            0.6 to 1.4.
+    """
+
+    def __init__(
+        self, args: argparse.Namespace, rng: Optional[np.random.Generator] = None
+    ) -> None:
+        super().__init__(args, rng)
+        self.weights: np.ndarray = np.array([13, 5, 2, 1]) * self.rng.uniform(
+            0.6, 1.4, size=4
+        )
+        self.jitter = 0.15
+
+    def curve(self, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        w1, w2, w3, w4 = self.weights
+        y: np.ndarray = (
+            w1 * np.cos(t)
+            - w2 * np.cos(2 * t)
+            - w3 * np.cos(3 * t)
+            - w4 * np.cos(4 * t)
+        )
+        # y grows downward in the image, so flip it to keep the heart upright
+        return np.sin(t) ** 3, -y / self.weights.sum()
+
+
+GENERATORS: dict[str, type[PointGeneratorInterface]] = {
+    "random": RandPointGenerator,
+    "poisson": PoissonDiskPointGenerator,
+    "halton": HaltonPointGenerator,
+    "sobol": SobolPointGenerator,
+    "r2": R2PointGenerator,
+    "love": LovePointGenerator,
+    "lissajous": LissajousPointGenerator,
+    "rose": RosePointGenerator,
+    "hypotrochoid": HypotrochoidPointGenerator,
+    "superformula": SuperformulaPointGenerator,
+    "heart": HeartPointGenerator,
+}
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+
+# Offsets, in cells, of the cells that can hold a point too close to one in
+# the middle cell (the corners of the 5x5 block are always far enough)
+_NEAR: list[tuple[int, int]] = [
+    (di, dj) for di in range(-2, 3) for dj in range(-2, 3) if abs(di) + abs(dj) < 4
+]
+
+
+def poisson_disk(
+    width: float, spacing: float, rng: np.random.Generator, attempts: int = 8
+) -> np.ndarray:
+    """Scatters points over a square, no two of them closer than spacing.
+
+    Like Bridson's algorithm, the square is covered by a background grid of
+    cells spacing / sqrt(2) wide, so each cell holds at most one point and
+    a new point only has to be checked against the 21 cells around its own.
+    Instead of growing the points one at a time from an active list, darts
+    are thrown at every empty cell at once, one phase of the grid at a time:
+    cells three apart can't hold points closer than spacing, so splitting
+    the grid into 9 phases lets a whole phase be checked and filled with a
+    few NumPy operations. Every empty cell gets attempts darts. Each dart
+    costs the same, so the whole thing is O(n).
+
+    Args:
+        width (float): Size of the square, which starts at 0.
+        spacing (float): Smallest distance between two points.
+        rng (np.random.Generator): Source of randomness.
+        attempts (int): How many darts each cell gets before it's left empty.
+
+    Returns:
+        np.ndarray: (n, 2) float array of x, y coordinates, in the order of
+            the cells, row by row.
+    """
+
+    # Grid, with two empty cells all round so every cell has its neighbors
+    side: float = spacing / math.sqrt(2)
+    cells: int = math.ceil(width / side)
+    stride: int = cells + 4
+    xs: np.ndarray = np.full(stride * stride, np.inf)
+    ys: np.ndarray = np.full(stride * stride, np.inf)
+    near: np.ndarray = np.array([di * stride + dj for di, dj in _NEAR])
+
+    # Rows, columns and flat indices of the cells of each phase
+    phases: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+    for phase in range(9):
+        rows, columns = np.meshgrid(
+            np.arange(phase // 3, cells, 3),
+            np.arange(phase % 3, cells, 3),
+            indexing="ij",
+        )
+        rows, columns = rows.ravel(), columns.ravel()
+        phases.append((rows, columns, (rows + 2) * stride + columns + 2))
+
+    for _ in range(attempts):
+        for phase in rng.permutation(9):
+            rows, columns, flat = phases[phase]
+            empty: np.ndarray = np.isinf(xs[flat])
+            rows, columns, flat = rows[empty], columns[empty], flat[empty]
+
+            # Throw a dart in each empty cell, and keep the ones far enough
+            x: np.ndarray = (columns + rng.random(len(flat))) * side
+            y: np.ndarray = (rows + rng.random(len(flat))) * side
+            neighbors: np.ndarray = flat[:, None] + near
+            distance: np.ndarray = (xs[neighbors] - x[:, None]) ** 2
+            distance += (ys[neighbors] - y[:, None]) ** 2
+            keep: np.ndarray = (
+                (distance.min(axis=1) >= spacing * spacing) & (x < width) & (y < width)
+            )
+            xs[flat[keep]] = x[keep]
+            ys[flat[keep]] = y[keep]
+
+    filled: np.ndarray = np.isfinite(xs)
+    return np.stack((xs[filled], ys[filled]), axis=1)
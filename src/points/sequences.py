@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import functools
+
+import numpy as np
+
+# Bits of precision of the Sobol points
+_SOBOL_BITS: int = 32
+
+# Bits of the index looked up at a time in the Sobol tables
+_SOBOL_BYTE: int = 8
+
+# Most entries in a table of the radical inverses of a few digits at once
+_TABLE_SIZE: int = 4096
+
+# Plastic number, the 2D golden ratio that the R2 sequence steps by
+_PLASTIC: float = 1.324717957244746
+
+
+def _sobol_tables() -> np.ndarray:
+    """Works out the Sobol coordinates of each byte of an index.
+
+    The first dimension is the van der Corput sequence in base 2, the
+    second comes from the primitive polynomial x + 1, for which each
+    direction number m is 2 m ^ m of the one before it, starting from 1.
+    A point is the XOR of the direction numbers of the bits set in its
+    index, so the XOR of every byte's entry in the tables.
+
+    Returns:
+        np.ndarray: (_SOBOL_BITS / _SOBOL_BYTE, 2 ** _SOBOL_BYTE, 2) uint64
+            coordinates of every value of every byte of the index.
+    """
+
+    directions: np.ndarray = np.empty((_SOBOL_BITS, 2), dtype=np.uint64)
+    m: int = 1
+    for k in range(_SOBOL_BITS):
+        directions[k] = (1 << (_SOBOL_BITS - 1 - k), m << (_SOBOL_BITS - 1 - k))
+        m = (m << 1) ^ m
+
+    values: np.ndarray = np.arange(1 << _SOBOL_BYTE)
+    tables: np.ndarray = np.zeros(
+        (_SOBOL_BITS // _SOBOL_BYTE, 1 << _SOBOL_BYTE, 2), dtype=np.uint64
+    )
+    for k in range(_SOBOL_BITS):
+        byte, bit = divmod(k, _SOBOL_BYTE)
+        tables[byte, (values >> bit) & 1 == 1] ^= directions[k]
+    return tables
+
+
+_SOBOL_TABLES: np.ndarray = _sobol_tables()
+
+
+@functools.lru_cache(maxsize=None)
+def _digit_table(base: int) -> tuple[int, np.ndarray]:
+    """Works out the radical inverses of every number of a few digits.
+
+    Args:
+        base (int): Base to write the numbers in.
+
+    Returns:
+        tuple[int, np.ndarray]: How many numbers there are (a power of the
+            base) and their radical inverses, read-only.
+    """
+
+    size: int = base
+    while size * base <= _TABLE_SIZE:
+        size *= base
+    table: np.ndarray = np.zeros(size)
+    remaining: np.ndarray = np.arange(size)
+    scale: float = 1 / base
+    while remaining.any():
+        remaining, digit = np.divmod(remaining, base)
+        table += digit * scale
+        scale /= base
+    table.setflags(write=False)
+    return size, table
+
+
+def radical_inverse(index: np.ndarray, base: int) -> np.ndarray:
+    """Mirrors the digits of each index about the point, in some base.
+
+    In base 10, 123 becomes 0.321. It's the van der Corput sequence, and
+    in each of two coprime bases, a Halton sequence's coordinates. The
+    digits are mirrored a few at a time, from a table.
+
+    Args:
+        index (np.ndarray): (n,) int64 indices.
+        base (int): Base to write the indices in.
+
+    Returns:
+        np.ndarray: (n,) floats between 0 and 1.
+    """
+
+    size, table = _digit_table(base)
+    result: np.ndarray = np.zeros(len(index))
+    remaining: np.ndarray = index.copy()
+    scale: float = 1
+    while remaining.any():
+        remaining, digits = np.divmod(remaining, size)
+        result += table[digits] * scale
+        scale /= size
+    return result
+
+
+def halton(start: int, n: int) -> np.ndarray:
+    """Gives points of the 2D Halton sequence (in bases 2 and 3).
+
+    Args:
+        start (int): Index of the first point.
+        n (int): How many points to give.
+
+    Returns:
+        np.ndarray: (n, 2) floats between 0 and 1.
+    """
+
+    index: np.ndarray = np.arange(start, start + n, dtype=np.int64)
+    return np.stack((radical_inverse(index, 2), radical_inverse(index, 3)), axis=1)
+
+
+def sobol(start: int, n: int, shift: tuple[int, int] = (0, 0)) -> np.ndarray:
+    """Gives points of the 2D Sobol sequence.
+
+    Args:
+        start (int): Index of the first point.
+        n (int): How many points to give.
+        shift (tuple[int, int]): _SOBOL_BITS-bit numbers to XOR each
+            coordinate with. A random shift scrambles the sequence while
+            keeping it just as even.
+
+    Raises:
+        ValueError: If the points go past the sequence's last index.
+
+    Returns:
+        np.ndarray: (n, 2) floats between 0 and 1.
+    """
+
+    if start + n > 1 << _SOBOL_BITS:
+        raise ValueError(f"Sobol points stop at index {(1 << _SOBOL_BITS) - 1}")
+    index: np.ndarray = np.arange(start, start + n, dtype=np.int64)
+    bits: np.ndarray = np.tile(np.array(shift, dtype=np.uint64), (n, 1))
+    mask: int = (1 << _SOBOL_BYTE) - 1
+    for byte, table in enumerate(_SOBOL_TABLES):
+        bits ^= table[(index >> (byte * _SOBOL_BYTE)) & mask]
+    return bits / float(1 << _SOBOL_BITS)
+
+
+def r2(start: int, n: int) -> np.ndarray:
+    """Gives points of Roberts' R2 sequence.
+
+    Each point is a step of (1 / p, 1 / p^2) from the last, wrapped into the
+    unit square, where p is the plastic number.
+
+    Args:
+        start (int): Index of the first point.
+        n (int): How many points to give.
+
+    Returns:
+        np.ndarray: (n, 2) floats between 0 and 1.
+    """
+
+    index: np.ndarray = np.arange(start, start + n, dtype=np.float64)
+    step: np.ndarray = np.array([1 / _PLASTIC, 1 / _PLASTIC**2])
+    return (0.5 + index[:, None] * step) % 1
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Hashable, Iterator, Optional
+
+import numpy as np
+from PIL import Image
+
+
+class BufferPool:
+    """Class to reuse canvases and scratch arrays from one image to the next.
+
+    Every image of a batch needs the same few big buffers (the supersampled
+    canvas, the accumulator, a scratch image...), so instead of allocating
+    and freeing them each time, a buffer is handed back to the pool when
+    the image is done and given, cleared in place, to the next image that
+    asks for one of the same shape and type. Buffers are keyed by their
+    exact shape and mode, which for a whole canvas is what the image's size,
+    scale factor and mode decide.
+
+    Buffers that haven't been asked for in a while are dropped once the pool
+    holds more than max_bytes, so a process that draws many different sizes
+    doesn't keep them all. By default that's the working set of the biggest
+    image drawn so far: everything lent out while renderers marked it as
+    being drawn (or, outside of that, the most lent out at once). Every
+    process has its own pool, so a fixed cap would be paid once per worker.
+    The pool can be shared between threads.
+
+    Only buffers that are done with once the image is drawn are pooled. The
+    points outlive the drawing (they're kept with the image's sketch, and
+    handed from one pipeline stage to the next), and at 16 bytes a point
+    they're small next to the canvases anyway.
+
+    Attributes:
+        max_bytes (Optional[int]): How much memory idle buffers can hold, or
+            None for the working set of the biggest image.
+        hits (int): How many buffers were reused.
+        misses (int): How many buffers had to be allocated.
+        working_set (int): Bytes lent out for the biggest image so far.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        self.max_bytes: Optional[int] = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.working_set: int = 0
+        self._idle: OrderedDict[Hashable, list[Any]] = OrderedDict()
+        self._idle_bytes: int = 0
+        self._lent_bytes: int = 0
+        self._drawings: int = 0
+        self._drawn_bytes: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    @contextmanager
+    def drawing(self) -> Iterator[None]:
+        """Marks the drawing of an image, for the pool to size itself to.
+
+        Everything lent out until the block ends counts towards the image's
+        working set, even buffers that are given back and taken again (like
+        the tiled renderer's tiles). Images drawn at the same time by
+        several threads count as one.
+        """
+
+        with self._lock:
+            if not self._drawings:
+                self._drawn_bytes = 0
+            self._drawings += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._drawings -= 1
+                self.working_set = max(self.working_set, self._drawn_bytes)
+
+    def _lend(self, buffer: Any) -> None:
+        with self._lock:
+            self._lent_bytes += _nbytes(buffer)
+            if self._drawings:
+                self._drawn_bytes += _nbytes(buffer)
+            self.working_set = max(self.working_set, self._lent_bytes)
+
+    def _take(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            idle: Optional[list[Any]] = self._idle.get(key)
+            if not idle:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._idle.move_to_end(key)
+            buffer: Any = idle.pop()
+            self._idle_bytes -= _nbytes(buffer)
+            return buffer
+
+    def _give(self, key: Hashable, buffer: Any) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(buffer)
+            self._idle.move_to_end(key)
+            self._idle_bytes += _nbytes(buffer)
+            self._lent_bytes -= _nbytes(buffer)
+
+            # Drop the buffers of the least recently used shapes first
+            max_bytes: int = (
+                self.max_bytes
+                if self.max_bytes is not None
+                else max(self.working_set, self._drawn_bytes)
+            )
+            while self._idle_bytes > max_bytes:
+                oldest: list[Any] = next(iter(self._idle.values()))
+                self._idle_bytes -= _nbytes(oldest.pop())
+                if not oldest:
+                    self._idle.popitem(last=False)
+
+    @contextmanager
+    def image(
+        self,
+        width: int,
+        height: int,
+        mode: str = "RGB",
+        color: Optional[tuple[int, ...]] = (0, 0, 0),
+    ) -> Iterator[Image.Image]:
+        """Lends a Pillow image for the duration of a with block.
+
+        Args:
+            width (int): Width of the image.
+            height (int): Height of the image.
+            mode (str): Pillow mode of the image.
+            color (Optional[tuple[int, ...]]): What to fill the image with, or
+                None to leave whatever the last user drew.
+
+        Yields:
+            Image.Image: The image. It must not be used after the block.
+        """
+
+        key: Hashable = ("image", mode, width, height)
+        img: Optional[Image.Image] = self._take(key)
+        if img is None:
+            img = Image.new(mode, (width, height), color=color or 0)
+        elif color is not None:
+            img.paste(color, (0, 0, width, height))
+        self._lend(img)
+        try:
+            yield img
+        finally:
+            self._give(key, img)
+
+    @contextmanager
+    def array(
+        self,
+        shape: tuple[int, ...],
+        dtype: type = np.uint8,
+        fill: Optional[Any] = None,
+    ) -> Iterator[np.ndarray]:
+        """Lends a NumPy array for the duration of a with block.
+
+        Args:
+            shape (tuple[int, ...]): Shape of the array.
+            dtype (type): Type of the array's values.
+            fill (Optional[Any]): What to fill the array with (anything that
+                broadcasts to it), or None to leave its contents as they are.
+
+        Yields:
+            np.ndarray: The array. It must not be used after the block.
+        """
+
+        key: Hashable = ("array", np.dtype(dtype).str, shape)
+        array: Optional[np.ndarray] = self._take(key)
+        if array is None:
+            array = np.empty(shape, dtype=dtype)
+        if fill is not None:
+            array[...] = fill
+        self._lend(array)
+        try:
+            yield array
+        finally:
+            self._give(key, array)
+
+
+def _nbytes(buffer: Any) -> int:
+    """Finds roughly how much memory a pooled buffer holds."""
+
+    if isinstance(buffer, np.ndarray):
+        return buffer.nbytes
+    # Pillow stores multi-band images with 4 bytes per pixel
+    return buffer.width * buffer.height * (4 if len(buffer.getbands()) > 1 else 1)
+
+
+# Shared by every renderer in the process, unless they're given their own
+BUFFERS: BufferPool = BufferPool()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+# How many final pixels past the edge of a region each filter reads
+APRONS: dict[str, int] = {
+    "box": 0,
+    "gamma": 0,
+    "lanczos": 3,
+}
+
+# sRGB value (0-255) to linear light (0-65535)
+_TO_LINEAR: np.ndarray = np.rint(
+    np.where(
+        np.arange(256) / 255 <= 0.04045,
+        np.arange(256) / 255 / 12.92,
+        ((np.arange(256) / 255 + 0.055) / 1.055) ** 2.4,
+    )
+    * 65535
+).astype(np.uint16)
+
+
+def _to_srgb(linear: np.ndarray) -> np.ndarray:
+    """Converts linear light (0-1) back to sRGB values (0-255)."""
+
+    srgb: np.ndarray = np.where(
+        linear <= 0.0031308,
+        linear * 12.92,
+        1.055 * np.power(linear, 1 / 2.4) - 0.055,
+    )
+    return np.clip(np.rint(srgb * 255), 0, 255).astype(np.uint8)
+
+
+def _block_sum(pixels: np.ndarray, scale_factor: int) -> np.ndarray:
+    """Adds up each scale_factor x scale_factor block of a (h, w, 3) array.
+
+    The rows of each block are added first, while they're still contiguous,
+    which is much quicker than summing over both axes of a reshaped view.
+    """
+
+    height: int = pixels.shape[0] // scale_factor
+    width: int = pixels.shape[1] // scale_factor
+    rows: np.ndarray = pixels.reshape(height, scale_factor, -1)
+    total: np.ndarray = rows[:, 0].astype(np.uint32)
+    for k in range(1, scale_factor):
+        total += rows[:, k]
+
+    cols: np.ndarray = total.reshape(height, width, scale_factor, 3)
+    blocks: np.ndarray = cols[:, :, 0].copy()
+    for k in range(1, scale_factor):
+        blocks += cols[:, :, k]
+    return blocks
+
+
+def downsample(
+    img: Image.Image,
+    scale_factor: int,
+    resample: str = "lanczos",
+    box: Optional[tuple[int, int, int, int]] = None,
+) -> Image.Image:
+    """Shrinks a supersampled canvas to make it smoother.
+
+    Since scale_factor is a whole number, every final pixel comes from an
+    exact scale_factor x scale_factor block of the canvas.
+
+    Args:
+        img (Image.Image): Supersampled canvas.
+        scale_factor (int): How much bigger the canvas is than the result.
+        resample (str): Filter to use. 'box' averages each block, 'gamma'
+            averages each block in linear light and 'lanczos' uses a
+            Lanczos filter, which reads APRONS['lanczos'] final pixels past
+            the box (when the image has them).
+        box (Optional[tuple[int, int, int, int]]): Region of the canvas to
+            shrink. Default: the whole canvas.
+
+    Returns:
+        Image.Image: Image scale_factor times smaller than the region.
+    """
+
+    if box is None:
+        box = (0, 0, img.width, img.height)
+    left, upper, right, lower = box
+    size: tuple[int, int] = (
+        (right - left) // scale_factor,
+        (lower - upper) // scale_factor,
+    )
+
+    if resample == "box":
+        return img.reduce(scale_factor, box=box)
+
+    if resample == "gamma":
+        pixels: np.ndarray = _TO_LINEAR[np.asarray(img.crop(box))]
+        linear: np.ndarray = _block_sum(pixels, scale_factor) / (
+            scale_factor * scale_factor * 65535
+        )
+        return Image.fromarray(_to_srgb(linear), mode="RGB")
+
+    if resample == "lanczos":
+        return img.resize(size, resample=Image.Resampling.LANCZOS, box=box)
+
+    raise ValueError(f"Unknown resampling filter: {resample}")
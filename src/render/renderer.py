@@ -0,0 +1,624 @@
+# -*- coding: utf-8 -*-
+
+import abc
+import argparse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw
+
+from src.points.buffer import PointBuffer
+from src.render.buffers import BUFFERS, BufferPool
+from src.render.downsample import APRONS, downsample
+from src.render.raster import BAND_PIXELS, rasterize, segment_boxes
+from src.render.segment import (
+    segment_arrays,
+    segment_box,
+    segment_chunks,
+    segments,
+)
+from src.render.tiles import bin_segments
+
+
+class RendererInterface(metaclass=abc.ABCMeta):
+    """Class to represent any way of drawing the lines."""
+
+    @classmethod
+    def __subclasshook__(cls, subclass) -> bool:
+        return hasattr(subclass, "render") and callable(subclass.render)
+
+    @abc.abstractmethod
+    def render(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        """Draws the points as a closed loop of lines.
+
+        Args:
+            points (PointBuffer): Centered points, in supersampled pixels.
+            start_color (tuple[int, int, int]): Color of the first line.
+            end_color (tuple[int, int, int]): Color of the last line.
+            target_size (int): Size of the final image.
+            scale_factor (int): Scaling for antialiasing.
+
+        Returns:
+            Image.Image: Image of the target size.
+        """
+
+        raise NotImplementedError
+
+
+class StreamingRendererInterface(RendererInterface):
+    """Class to represent a renderer that can draw the image in bands."""
+
+    @classmethod
+    def __subclasshook__(cls, subclass) -> bool:
+        return hasattr(subclass, "render_bands") and callable(
+            subclass.render_bands
+        )
+
+    @abc.abstractmethod
+    def render_bands(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Iterator[np.ndarray]:
+        """Draws the points as a closed loop of lines, a band at a time.
+
+        Args:
+            points (PointBuffer): Centered points, in supersampled pixels.
+            start_color (tuple[int, int, int]): Color of the first line.
+            end_color (tuple[int, int, int]): Color of the last line.
+            target_size (int): Size of the final image.
+            scale_factor (int): Scaling for antialiasing.
+
+        Yields:
+            np.ndarray: (rows, target_size, 3) uint8 bands of the final image,
+                from top to bottom.
+        """
+
+        raise NotImplementedError
+
+    def render(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        bands: list[np.ndarray] = list(
+            self.render_bands(
+                points, start_color, end_color, target_size, scale_factor
+            )
+        )
+        return Image.fromarray(np.concatenate(bands), mode="RGB")
+
+
+class ChunkedRendererInterface(RendererInterface):
+    """Class to represent a renderer that can draw points as they come.
+
+    The points are handed over a chunk at a time and drawn straight away,
+    so however many there are, only one chunk is ever in memory.
+    """
+
+    @classmethod
+    def __subclasshook__(cls, subclass) -> bool:
+        return hasattr(subclass, "render_chunks") and callable(
+            subclass.render_chunks
+        )
+
+    @abc.abstractmethod
+    def render_chunks(
+        self,
+        chunks: Iterable[PointBuffer],
+        count: int,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        """Draws streamed points as a closed loop of lines.
+
+        Args:
+            chunks (Iterable[PointBuffer]): Centered points, in supersampled
+                pixels, in order.
+            count (int): How many points there are in all the chunks.
+            start_color (tuple[int, int, int]): Color of the first line.
+            end_color (tuple[int, int, int]): Color of the last line.
+            target_size (int): Size of the final image.
+            scale_factor (int): Scaling for antialiasing.
+
+        Returns:
+            Image.Image: Image of the target size.
+        """
+
+        raise NotImplementedError
+
+
+class OverlayRenderer(RendererInterface):
+    """Class to draw each line onto its own overlay, then add it to the image.
+
+    Each overlay only covers the bounding box of its line (plus the line's
+    thickness), so only that region of the image is composited. Pillow's
+    thick lines don't come out the same when they're moved, so rather than
+    drawing the line into a small image of its own, it's drawn where it
+    belongs on a full-size scratch image, and its box is cropped out as the
+    overlay and then wiped. That's pixel for pixel what the original
+    full-canvas overlays gave.
+
+    Attributes:
+        resample (str): Filter used to shrink the canvas (see downsample).
+        bg_color (tuple[int, int, int]): Background color of the image.
+        buffers (BufferPool): Where the canvases come from. Default: the
+            pool shared by the whole process.
+    """
+
+    def __init__(
+        self,
+        resample: str = "lanczos",
+        bg_color: tuple[int, int, int] = (0, 0, 0),
+        buffers: Optional[BufferPool] = None,
+    ) -> None:
+        super().__init__()
+        self.resample: str = resample
+        self.bg_color: tuple[int, int, int] = bg_color
+        self.buffers: BufferPool = buffers if buffers is not None else BUFFERS
+
+    def render(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        size: int = target_size * scale_factor
+        canvas = self.buffers.image(size, size, color=self.bg_color)
+        scratch = self.buffers.image(size, size, color=self.bg_color)
+        with self.buffers.drawing(), canvas as img, scratch as scratch_img:
+            scratch_draw: ImageDraw.ImageDraw = ImageDraw.Draw(scratch_img)
+
+            for segment in segments(points, start_color, end_color, scale_factor):
+                box = segment_box(segment, size)
+                if box is None:
+                    continue
+
+                # Draw the line where it belongs, and crop out its overlay
+                scratch_draw.line(
+                    (segment.start, segment.end),
+                    fill=segment.color,
+                    width=segment.thickness,
+                )
+                overlay_img: Image.Image = scratch_img.crop(box)
+                scratch_draw.rectangle(
+                    (box[0], box[1], box[2] - 1, box[3] - 1), fill=self.bg_color
+                )
+
+                # Add the overlay channel to the region it covers
+                img.paste(ImageChops.add(img.crop(box), overlay_img), box)
+
+            return downsample(img, scale_factor, self.resample)
+
+
+class AccumulateRenderer(RendererInterface):
+    """Class to add every line into one persistent canvas.
+
+    Lines are drawn onto a single scratch image that is reused for the whole
+    render. Only the region each line touches is added to the canvas and then
+    cleared, so the work follows the lines instead of the canvas area.
+
+    Attributes:
+        resample (str): Filter used to shrink the canvas (see downsample).
+        bg_color (tuple[int, int, int]): Background color of the image.
+        buffers (BufferPool): Where the canvases come from. Default: the
+            pool shared by the whole process.
+    """
+
+    def __init__(
+        self,
+        resample: str = "lanczos",
+        bg_color: tuple[int, int, int] = (0, 0, 0),
+        buffers: Optional[BufferPool] = None,
+    ) -> None:
+        super().__init__()
+        self.resample: str = resample
+        self.bg_color: tuple[int, int, int] = bg_color
+        self.buffers: BufferPool = buffers if buffers is not None else BUFFERS
+
+    def render(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        size: int = target_size * scale_factor
+        canvas = self.buffers.image(size, size, color=self.bg_color)
+        scratch = self.buffers.image(size, size)
+        with self.buffers.drawing(), canvas as img, scratch as scratch_img:
+            scratch_draw: ImageDraw.ImageDraw = ImageDraw.Draw(scratch_img)
+
+            for segment in segments(points, start_color, end_color, scale_factor):
+                box = segment_box(segment, size)
+                if box is None:
+                    continue
+
+                # Draw the line onto the scratch image
+                scratch_draw.line(
+                    (segment.start, segment.end),
+                    fill=segment.color,
+                    width=segment.thickness,
+                )
+
+                # Add only the touched region, then wipe it for the next line
+                region: Image.Image = ImageChops.add(
+                    img.crop(box), scratch_img.crop(box)
+                )
+                img.paste(region, box)
+                scratch_draw.rectangle(
+                    (box[0], box[1], box[2] - 1, box[3] - 1), fill=(0, 0, 0)
+                )
+
+            return downsample(img, scale_factor, self.resample)
+
+
+class NumpyRenderer(ChunkedRendererInterface):
+    """Class to rasterize all the lines with batched NumPy operations.
+
+    Instead of one draw call per line, the distance from every pixel near a
+    line to that line is found in vectorized chunks, and the colors are
+    added into a uint16 accumulator that saturates at 255.
+
+    Attributes:
+        resample (str): Filter used to shrink the canvas (see downsample).
+        bg_color (tuple[int, int, int]): Background color of the image.
+        buffers (BufferPool): Where the canvases come from. Default: the
+            pool shared by the whole process.
+    """
+
+    def __init__(
+        self,
+        resample: str = "lanczos",
+        bg_color: tuple[int, int, int] = (0, 0, 0),
+        buffers: Optional[BufferPool] = None,
+    ) -> None:
+        super().__init__()
+        self.resample: str = resample
+        self.bg_color: tuple[int, int, int] = bg_color
+        self.buffers: BufferPool = buffers if buffers is not None else BUFFERS
+
+    def render(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        lines = segment_arrays(points, start_color, end_color, scale_factor)
+        return self._draw([lines], target_size, scale_factor)
+
+    def render_chunks(
+        self,
+        chunks: Iterable[PointBuffer],
+        count: int,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        lines = segment_chunks(chunks, count, start_color, end_color, scale_factor)
+        return self._draw(lines, target_size, scale_factor)
+
+    def _draw(
+        self,
+        lines: Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        """Rasterizes batches of lines onto one canvas and shrinks it.
+
+        Args:
+            lines (Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]]): Lines,
+                colors and thicknesses, like segment_arrays returns.
+            target_size (int): Size of the final image.
+            scale_factor (int): Scaling for antialiasing.
+
+        Returns:
+            Image.Image: Image of the target size.
+        """
+
+        size: int = target_size * scale_factor
+        accumulator = self.buffers.array((size, size, 3), np.uint16, self.bg_color)
+        staging = self.buffers.array((size, size, 3))
+        canvas = self.buffers.image(size, size, color=None)
+        drawing = self.buffers.drawing()
+        with drawing, accumulator as acc, staging as pixels, canvas as img:
+            for ends, colors, thickness in lines:
+                rasterize(acc, ends, colors, thickness)
+
+            # Copy the saturated accumulator into the canvas, in place
+            np.copyto(pixels, acc, casting="unsafe")
+            img.frombytes(pixels)
+            return downsample(img, scale_factor, self.resample)
+
+
+class AnalyticRenderer(ChunkedRendererInterface):
+    """Class to draw antialiased lines straight at the target size.
+
+    Rather than drawing at scale_factor times the size and shrinking the
+    result, the lines are scaled down and every pixel gets the line's color
+    weighted by how much of the pixel the line covers. This needs about
+    1 / scale_factor^2 of the memory. Only the pixels along the edges of a
+    line have their coverage worked out, so it takes about as long as the
+    numpy renderer at a scale factor of 2, and less above that.
+
+    Attributes:
+        bg_color (tuple[int, int, int]): Background color of the image.
+        buffers (BufferPool): Where the accumulator comes from. Default: the
+            pool shared by the whole process.
+    """
+
+    def __init__(
+        self,
+        bg_color: tuple[int, int, int] = (0, 0, 0),
+        buffers: Optional[BufferPool] = None,
+    ) -> None:
+        super().__init__()
+        self.bg_color: tuple[int, int, int] = bg_color
+        self.buffers: BufferPool = buffers if buffers is not None else BUFFERS
+
+    def render(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        lines = segment_arrays(points, start_color, end_color, scale_factor)
+        return self._draw([lines], target_size, scale_factor)
+
+    def render_chunks(
+        self,
+        chunks: Iterable[PointBuffer],
+        count: int,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        lines = segment_chunks(chunks, count, start_color, end_color, scale_factor)
+        return self._draw(lines, target_size, scale_factor)
+
+    def _draw(
+        self,
+        lines: Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        target_size: int,
+        scale_factor: int,
+    ) -> Image.Image:
+        """Rasterizes batches of supersampled lines at the target size.
+
+        Args:
+            lines (Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]]): Lines,
+                colors and thicknesses, like segment_arrays returns.
+            target_size (int): Size of the final image.
+            scale_factor (int): Scaling the lines were made for.
+
+        Returns:
+            Image.Image: Image of the target size.
+        """
+
+        with self.buffers.drawing(), self.buffers.array(
+            (target_size, target_size, 3), np.uint16, self.bg_color
+        ) as acc:
+            for ends, colors, thickness in lines:
+                # Move the supersampled pixel centers onto the target ones
+                ends = (ends - (scale_factor - 1) / 2) / scale_factor
+                rasterize(acc, ends, colors, thickness / scale_factor, antialias=True)
+
+            # Convert a band at a time, so there's never a second full copy
+            img: Image.Image = Image.new("RGB", (target_size, target_size))
+            step: int = max(1, BAND_PIXELS // target_size)
+            for top in range(0, target_size, step):
+                band: np.ndarray = acc[top : top + step].astype(np.uint8)
+                img.paste(Image.fromarray(band, mode="RGB"), (0, top))
+            return img
+
+
+class TiledRenderer(StreamingRendererInterface):
+    """Class to draw huge images one tile at a time.
+
+    The lines are binned into the tiles their (thickened) bounding boxes
+    touch. Each tile is drawn at scale_factor times its size, with an apron
+    if the resampling filter needs to see its neighbors, then shrunk as soon
+    as it's done, so the supersampled image never exists all at once.
+
+    Tiles can be drawn by a pool of threads: the NumPy kernels and Pillow's
+    resize release the GIL, so they run in parallel. At most two tiles per
+    thread and one row of final tiles are in memory at once, whatever the
+    size of the image.
+
+    Attributes:
+        tile_size (int): Square size of the tiles in the final image.
+        threads (int): How many tiles to draw at the same time.
+        resample (str): Filter used to shrink the tiles (see downsample).
+        bg_color (tuple[int, int, int]): Background color of the image.
+        buffers (BufferPool): Where the tiles' canvases come from. Default:
+            the pool shared by the whole process.
+    """
+
+    def __init__(
+        self,
+        tile_size: int = 512,
+        threads: int = 1,
+        resample: str = "lanczos",
+        bg_color: tuple[int, int, int] = (0, 0, 0),
+        buffers: Optional[BufferPool] = None,
+    ) -> None:
+        super().__init__()
+        self.tile_size: int = tile_size
+        self.threads: int = threads
+        self.resample: str = resample
+        self.bg_color: tuple[int, int, int] = bg_color
+        self.buffers: BufferPool = buffers if buffers is not None else BUFFERS
+
+    def _draw_tile(
+        self,
+        ends: np.ndarray,
+        colors: np.ndarray,
+        thickness: np.ndarray,
+        box: tuple[int, int, int, int],
+        size: int,
+        scale_factor: int,
+    ) -> np.ndarray:
+        """Draws the lines onto one tile and shrinks it.
+
+        Args:
+            ends (np.ndarray): (n, 4) array of the lines touching the tile.
+            colors (np.ndarray): (n, 3) array of their colors.
+            thickness (np.ndarray): (n,) array of their widths.
+            box (tuple[int, int, int, int]): The tile, in supersampled pixels.
+            size (int): Size of the supersampled canvas.
+            scale_factor (int): Scaling for antialiasing.
+
+        Returns:
+            np.ndarray: uint8 pixels of the tile in the final image.
+        """
+
+        left, upper, right, lower = box
+        apron: int = APRONS[self.resample] * scale_factor
+
+        # Draw the tile and its apron, clipped to the canvas
+        region: tuple[int, int, int, int] = (
+            max(left - apron, 0),
+            max(upper - apron, 0),
+            min(right + apron, size),
+            min(lower + apron, size),
+        )
+        width: int = region[2] - region[0]
+        height: int = region[3] - region[1]
+        accumulator = self.buffers.array((height, width, 3), np.uint16, self.bg_color)
+        staging = self.buffers.array((height, width, 3))
+        canvas = self.buffers.image(width, height, color=None)
+        with accumulator as acc, staging as pixels, canvas as img:
+            rasterize(acc, ends, colors, thickness, origin=(region[0], region[1]))
+            np.copyto(pixels, acc, casting="unsafe")
+            img.frombytes(pixels)
+
+            # Shrink just the tile, using the apron for its edges
+            tile_img: Image.Image = downsample(
+                img,
+                scale_factor,
+                self.resample,
+                box=(
+                    left - region[0],
+                    upper - region[1],
+                    right - region[0],
+                    lower - region[1],
+                ),
+            )
+        return np.asarray(tile_img)
+
+    def render_bands(
+        self,
+        points: PointBuffer,
+        start_color: tuple[int, int, int],
+        end_color: tuple[int, int, int],
+        target_size: int,
+        scale_factor: int,
+    ) -> Iterator[np.ndarray]:
+        size: int = target_size * scale_factor
+        tile: int = self.tile_size * scale_factor
+        across: int = -(-target_size // self.tile_size)
+
+        ends, colors, thickness = segment_arrays(
+            points, start_color, end_color, scale_factor
+        )
+        bins: list[np.ndarray] = bin_segments(
+            segment_boxes(ends, thickness, (0, 0, size, size)),
+            size,
+            tile,
+            apron=APRONS[self.resample] * scale_factor,
+        )
+
+        def draw(index: int) -> np.ndarray:
+            row, col = divmod(index, across)
+            which: np.ndarray = bins[index]
+            return self._draw_tile(
+                ends[which],
+                colors[which],
+                thickness[which],
+                (
+                    col * tile,
+                    row * tile,
+                    min((col + 1) * tile, size),
+                    min((row + 1) * tile, size),
+                ),
+                size,
+                scale_factor,
+            )
+
+        pool = ThreadPoolExecutor(max_workers=self.threads)
+        with self.buffers.drawing(), pool:
+            # Keep a few tiles queued per thread, in row-major order
+            pending: deque[Future] = deque()
+            queued: int = 0
+            ahead: int = 2 * self.threads
+
+            for row in range(across):
+                upper: int = row * tile
+                lower: int = min(upper + tile, size)
+                band: np.ndarray = np.empty(
+                    ((lower - upper) // scale_factor, target_size, 3), dtype=np.uint8
+                )
+
+                for col in range(across):
+                    while queued < across * across and len(pending) < ahead:
+                        pending.append(pool.submit(draw, queued))
+                        queued += 1
+                    left: int = col * self.tile_size
+                    right: int = left + self.tile_size
+                    band[:, left:right] = pending.popleft().result()
+
+                yield band
+
+
+RENDERERS: dict[str, type[RendererInterface]] = {
+    "overlay": OverlayRenderer,
+    "accumulate": AccumulateRenderer,
+    "numpy": NumpyRenderer,
+    "analytic": AnalyticRenderer,
+    "tiled": TiledRenderer,
+}
+
+
+def make_renderer(args: argparse.Namespace) -> RendererInterface:
+    """Builds the renderer picked in the arguments.
+
+    Args:
+        args (argparse.Namespace): Namespace of the arguments passed to the
+            script.
+
+    Returns:
+        RendererInterface: Renderer to draw the lines with.
+    """
+
+    if args.renderer == "tiled":
+        return TiledRenderer(
+            tile_size=args.tile_size, threads=args.threads, resample=args.resample
+        )
+    if args.renderer == "analytic":
+        return AnalyticRenderer()
+    return RENDERERS[args.renderer](resample=args.resample)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from src.colors.generator import interpolate
+from src.points.buffer import PointBuffer
+from src.points.point import Point
+
+
+class Segment(NamedTuple):
+    """Class to represent a line between two points.
+
+    Attributes:
+        start (Point): Where the line starts.
+        end (Point): Where the line ends.
+        color (tuple[int, int, int]): RGB color of the line.
+        thickness (int): Width of the line (in pixels).
+    """
+
+    start: Point
+    end: Point
+    color: tuple[int, int, int]
+    thickness: int
+
+
+def segments(
+    points: PointBuffer,
+    start_color: tuple[int, int, int],
+    end_color: tuple[int, int, int],
+    scale_factor: int,
+) -> Iterator[Segment]:
+    """Connects the points into a closed loop of styled lines.
+
+    The color fades from the start color to the end color, and the thickness
+    grows until halfway through the loop, then shrinks again.
+
+    Args:
+        points (PointBuffer): Points to connect, in order.
+        start_color (tuple[int, int, int]): Color of the first line.
+        end_color (tuple[int, int, int]): Color of the last line.
+        scale_factor (int): Scaling for antialiasing.
+
+    Yields:
+        Segment: Each line, with the last point connected to the first.
+    """
+
+    thickness: int = scale_factor
+    n: int = len(points) - 1
+    # The last point connects back to the first
+    for i, (p1, p2) in enumerate(points.pairs()):
+        # Find the current color for the line
+        color_factor: float = i / n
+        line_color: tuple[int, int, int] = interpolate(
+            start_color, end_color, color_factor
+        )
+
+        yield Segment(p1, p2, line_color, thickness)
+
+        # Increase the thickness for the next line
+        thickness += scale_factor if color_factor < 0.5 else -scale_factor
+
+
+def segment_box(
+    segment: Segment, size: int
+) -> Optional[tuple[int, int, int, int]]:
+    """Finds the region of the canvas a line can touch.
+
+    Args:
+        segment (Segment): Line to find the region for.
+        size (int): Square size of the canvas (in pixels).
+
+    Returns:
+        Optional[tuple[int, int, int, int]]: (left, upper, right, lower) box,
+            clipped to the canvas, or None if the line is off the canvas.
+    """
+
+    (x1, y1), (x2, y2) = segment.start, segment.end
+    pad: int = max(segment.thickness, 1)
+    left: int = max(min(x1, x2) - pad, 0)
+    upper: int = max(min(y1, y2) - pad, 0)
+    right: int = min(max(x1, x2) + pad + 1, size)
+    lower: int = min(max(y1, y2) + pad + 1, size)
+    if left >= right or upper >= lower:
+        return None
+    return (left, upper, right, lower)
+
+
+def segment_arrays(
+    points: PointBuffer,
+    start_color: tuple[int, int, int],
+    end_color: tuple[int, int, int],
+    scale_factor: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized version of segments, for the array based renderers.
+
+    Args:
+        points (PointBuffer): Points to connect, in order.
+        start_color (tuple[int, int, int]): Color of the first line.
+        end_color (tuple[int, int, int]): Color of the last line.
+        scale_factor (int): Scaling for antialiasing.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (n, 4) float array of
+            x1, y1, x2, y2 for each line, (n, 3) int array of colors and (n,)
+            int array of thicknesses, matching what segments yields.
+    """
+
+    ends: np.ndarray = points.ends()
+    colors, thickness = segment_styles(
+        np.arange(len(points)), len(points), start_color, end_color, scale_factor
+    )
+    return ends, colors, thickness
+
+
+def segment_styles(
+    index: np.ndarray,
+    count: int,
+    start_color: tuple[int, int, int],
+    end_color: tuple[int, int, int],
+    scale_factor: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the color and thickness of some of the lines of a loop.
+
+    Args:
+        index (np.ndarray): (k,) int array of which lines to style, counting
+            from the first point.
+        count (int): How many points (and so lines) the whole loop has.
+        start_color (tuple[int, int, int]): Color of the first line.
+        end_color (tuple[int, int, int]): Color of the last line.
+        scale_factor (int): Scaling for antialiasing.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (k, 3) int array of colors and (k,)
+            int array of thicknesses, matching what segments yields.
+    """
+
+    # Same mixing as interpolate, so the colors match exactly
+    n: int = count - 1
+    color_factor: np.ndarray = index / n
+    recip: np.ndarray = 1 - color_factor
+    colors: np.ndarray = (
+        np.asarray(start_color, dtype=np.float64) * recip[:, None]
+        + np.asarray(end_color, dtype=np.float64) * color_factor[:, None]
+    ).astype(np.int64)
+
+    # Grow for each of the lines before it in the first half, shrink after
+    growing: np.ndarray = np.minimum(index, (n + 1) // 2)
+    thickness: np.ndarray = scale_factor * (1 + growing - (index - growing))
+
+    return colors, thickness.astype(np.int64)
+
+
+def segment_chunks(
+    chunks: Iterable[PointBuffer],
+    count: int,
+    start_color: tuple[int, int, int],
+    end_color: tuple[int, int, int],
+    scale_factor: int,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Streaming version of segment_arrays, for points that come in chunks.
+
+    Only the first point and the last point of the previous chunk are kept
+    between chunks, so the loop can be as long as needed.
+
+    Args:
+        chunks (Iterable[PointBuffer]): Points to connect, in order.
+        count (int): How many points there are in all the chunks together.
+        start_color (tuple[int, int, int]): Color of the first line.
+        end_color (tuple[int, int, int]): Color of the last line.
+        scale_factor (int): Scaling for antialiasing.
+
+    Raises:
+        ValueError: If the chunks don't add up to count points.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Lines, colors and
+            thicknesses like segment_arrays returns, for the lines ending in
+            each chunk (and the one closing the loop, at the end).
+    """
+
+    first: Optional[Point] = None
+    previous: Optional[Point] = None
+    done: int = 0
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        if previous is None:
+            first = chunk[0]
+            x, y = chunk.x, chunk.y
+        else:
+            x = np.concatenate(([previous.x], chunk.x))
+            y = np.concatenate(([previous.y], chunk.y))
+        previous = chunk[-1]
+
+        ends: np.ndarray = np.empty((len(x) - 1, 4), dtype=np.float64)
+        ends[:, 0], ends[:, 1] = x[:-1], y[:-1]
+        ends[:, 2], ends[:, 3] = x[1:], y[1:]
+        yield (
+            ends,
+            *segment_styles(
+                np.arange(done, done + len(ends)),
+                count,
+                start_color,
+                end_color,
+                scale_factor,
+            ),
+        )
+        done += len(ends)
+
+    if first is None or previous is None or done != count - 1:
+        raise ValueError(f"Expected {count} points, got {done + 1}")
+
+    # Connect the last point to the first
+    yield (
+        np.array([[previous.x, previous.y, first.x, first.y]], dtype=np.float64),
+        *segment_styles(
+            np.array([done]), count, start_color, end_color, scale_factor
+        ),
+    )
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def bin_segments(
+    boxes: np.ndarray, size: int, tile_size: int, apron: int = 0
+) -> list[np.ndarray]:
+    """Sorts the lines into the square tiles of the canvas they touch.
+
+    Args:
+        boxes (np.ndarray): (n, 4) array of boxes from segment_boxes.
+        size (int): Square size of the canvas (in pixels).
+        tile_size (int): Square size of each tile (in pixels).
+        apron (int): Extra pixels around each tile that it also needs.
+
+    Returns:
+        list[np.ndarray]: For each tile, in row-major order, the indices of
+            the lines whose boxes overlap it (plus its apron), in order.
+    """
+
+    across: int = -(-size // tile_size)
+    valid: np.ndarray = np.flatnonzero(
+        (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+    )
+    boxes = boxes[valid]
+
+    # Range of tiles each box covers
+    first: np.ndarray = np.clip((boxes[:, :2] - apron) // tile_size, 0, across - 1)
+    last: np.ndarray = np.clip(
+        (boxes[:, 2:] - 1 + apron) // tile_size, 0, across - 1
+    )
+    spans: np.ndarray = last - first + 1
+    counts: np.ndarray = spans[:, 0] * spans[:, 1]
+
+    # One (tile, line) pair for every tile a box covers
+    seg: np.ndarray = np.repeat(np.arange(len(boxes)), counts)
+    offset: np.ndarray = np.arange(len(seg)) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    tile_x: np.ndarray = first[seg, 0] + offset % spans[seg, 0]
+    tile_y: np.ndarray = first[seg, 1] + offset // spans[seg, 0]
+    tile: np.ndarray = tile_y * across + tile_x
+
+    order: np.ndarray = np.argsort(tile, kind="stable")
+    splits: np.ndarray = np.searchsorted(tile[order], np.arange(1, across * across))
+    return np.split(valid[seg[order]], splits)
@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import bisect
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import (
+    CancelledError,
+    Future,
+    ProcessPoolExecutor,
+    TimeoutError,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from src.points.generator import GENERATORS
+from src.render.downsample import APRONS
+from src.render.renderer import RENDERERS
+
+# Request parameters the server understands, and how to read them
+PARAMS: dict[str, Callable[[str], Any]] = {
+    "size": int,
+    "scale_factor": int,
+    "num_points": int,
+    "margin": float,
+    "generator": str,
+    "renderer": str,
+    "resample": str,
+    "seed": int,
+    "index": int,
+}
+
+# Biggest supersampled canvas a request can ask for (in pixels per side)
+MAX_CANVAS: int = 16384
+
+# Most points a request can ask for, per renderer. Pillow draws every line
+# separately, so it costs far more per line than the batched NumPy renderers
+MAX_POINTS: dict[str, int] = {
+    "overlay": 1 << 12,
+    "accumulate": 1 << 12,
+    "numpy": 1 << 20,
+    "analytic": 1 << 20,
+    "tiled": 1 << 20,
+}
+
+# Upper bounds of the latency histogram's buckets, in milliseconds
+BUCKETS: list[float] = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+class LatencyHistogram:
+    """Class to count how long requests take, in fixed buckets.
+
+    Attributes:
+        counts (list[int]): Requests per bucket, plus one for anything slower
+            than the last bound.
+        total (float): Sum of all the latencies, in seconds.
+        slowest (float): Longest latency, in seconds.
+        lock (threading.Lock): Guards the counts, since requests are handled
+            on several threads.
+    """
+
+    def __init__(self) -> None:
+        self.counts: list[int] = [0] * (len(BUCKETS) + 1)
+        self.total: float = 0.0
+        self.slowest: float = 0.0
+        self.lock: threading.Lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Adds one request's latency.
+
+        Args:
+            seconds (float): How long the request took.
+        """
+
+        with self.lock:
+            self.counts[bisect.bisect_left(BUCKETS, seconds * 1000)] += 1
+            self.total += seconds
+            self.slowest = max(self.slowest, seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Estimates a latency percentile from the buckets.
+
+        Args:
+            fraction (float): Which percentile, between 0 and 1.
+
+        Returns:
+            Optional[float]: Upper bound of the bucket the percentile falls in,
+                in milliseconds (None if it's past the last bound, or there
+                are no requests yet).
+        """
+
+        with self.lock:
+            count: int = sum(self.counts)
+            seen: int = 0
+            for bound, n in zip(BUCKETS + [None], self.counts):
+                seen += n
+                if count and seen >= fraction * count:
+                    return bound
+        return None
+
+    def snapshot(self) -> dict[str, Any]:
+        """Summarizes the latencies so far.
+
+        Returns:
+            dict[str, Any]: Request count, mean, p50/p90/p99 and slowest
+                latency (in milliseconds), and the count of every bucket.
+        """
+
+        percentiles: dict[str, Optional[float]] = {
+            f"p{round(fraction * 100)}_ms": self.percentile(fraction)
+            for fraction in (0.5, 0.9, 0.99)
+        }
+        with self.lock:
+            count: int = sum(self.counts)
+            return {
+                "count": count,
+                "mean_ms": round(1000 * self.total / count, 3) if count else None,
+                **percentiles,
+                "max_ms": round(1000 * self.slowest, 3),
+                "buckets": {
+                    f"<={bound:g}ms": n for bound, n in zip(BUCKETS, self.counts)
+                }
+                | {f">{BUCKETS[-1]:g}ms": self.counts[-1]},
+            }
+
+
+def parse_request(query: str, defaults: argparse.Namespace) -> argparse.Namespace:
+    """Reads the parameters of a render request.
+
+    Args:
+        query (str): Query string of the request, like 'size=256&seed=4'.
+        defaults (argparse.Namespace): Namespace of the arguments passed to
+            the server, used for anything the request leaves out.
+
+    Raises:
+        ValueError: If a parameter is unknown, malformed or out of range.
+
+    Returns:
+        argparse.Namespace: Arguments to render the image with.
+    """
+
+    params: dict[str, Any] = {"index": 0}
+    for key, value in parse_qsl(query, strict_parsing=bool(query)):
+        if key not in PARAMS:
+            raise ValueError(f"unknown parameter '{key}'")
+        try:
+            params[key] = PARAMS[key](value)
+        except ValueError:
+            raise ValueError(f"bad value for '{key}': '{value}'")
+    args: argparse.Namespace = argparse.Namespace(**{**vars(defaults), **params})
+
+    if not 1 <= args.size or not 1 <= args.scale_factor:
+        raise ValueError("size and scale_factor must be positive")
+    if args.size * args.scale_factor > MAX_CANVAS:
+        raise ValueError(f"size * scale_factor must be at most {MAX_CANVAS}")
+    if not 0 <= args.margin < 0.5:
+        raise ValueError("margin must be between 0 and 0.5")
+    if args.index < 0:
+        raise ValueError("index must not be negative")
+    for key, choices in (
+        ("generator", GENERATORS),
+        ("renderer", RENDERERS),
+        ("resample", APRONS),
+    ):
+        if getattr(args, key) not in choices:
+            raise ValueError(f"{key} must be one of {', '.join(sorted(choices))}")
+    max_points: int = MAX_POINTS[args.renderer]
+    if not 2 <= args.num_points <= max_points:
+        raise ValueError(
+            f"num_points must be between 2 and {max_points} "
+            f"for the {args.renderer} renderer"
+        )
+    return args
+
+
+def _warm_up(
+    render: Callable[[argparse.Namespace], bytes], args: argparse.Namespace
+) -> None:
+    """Renders an image, so a new worker is ready before requests come.
+
+    It's drawn at the server's default size, scale factor and renderer, so
+    the canvases most requests need are already in the worker's buffer pool.
+    Only a few points are drawn, which is quick whatever the size.
+    """
+
+    try:
+        warm_up: argparse.Namespace = parse_request("num_points=4", args)
+    except ValueError:
+        # The defaults are out of range, so requests have to pick a size
+        warm_up = parse_request("size=8&scale_factor=1&num_points=4", args)
+    render(warm_up)
+
+
+class RenderService:
+    """Class to render requests on a pool of warm worker processes.
+
+    Attributes:
+        render (Callable[[argparse.Namespace], bytes]): Renders one image to
+            PNG bytes. Must be picklable (a module level function).
+        defaults (argparse.Namespace): Namespace of the arguments passed to
+            the server.
+        workers (int): How many processes render images.
+        max_concurrent (int): How many requests can be rendered or wait for
+            a worker at the same time.
+        limit (threading.BoundedSemaphore): Slots for those requests.
+        wait (float): How long a request can wait for a free slot before it's
+            turned away, in seconds.
+        timeout (float): How long a request can take to render (including
+            the wait for a worker) before it's given up on, in seconds.
+        latency (LatencyHistogram): Latencies of the successful renders,
+            including the wait for a slot.
+        rejected (int): How many requests were turned away because the server
+            was busy.
+        failed (int): How many requests failed while rendering.
+        timed_out (int): How many requests took longer than timeout.
+        in_flight (int): How many requests hold a slot right now.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[argparse.Namespace], bytes],
+        defaults: argparse.Namespace,
+        workers: int,
+        max_concurrent: int,
+        wait: float = 10.0,
+        timeout: float = 60.0,
+    ) -> None:
+        self.render: Callable[[argparse.Namespace], bytes] = render
+        self.defaults: argparse.Namespace = defaults
+        self.workers: int = workers
+        self.max_concurrent: int = max_concurrent
+        self.limit: threading.BoundedSemaphore = threading.BoundedSemaphore(
+            max_concurrent
+        )
+        self.wait: float = wait
+        self.timeout: float = timeout
+        self.latency: LatencyHistogram = LatencyHistogram()
+        self.rejected: int = 0
+        self.failed: int = 0
+        self.timed_out: int = 0
+        self.in_flight: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._pool: ProcessPoolExecutor = self._start_pool()
+        self._running: dict[Future, ProcessPoolExecutor] = {}
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        pool: ProcessPoolExecutor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_warm_up,
+            initargs=(self.render, self.defaults),
+        )
+        # Start every worker now rather than on the first requests
+        for _ in range(self.workers):
+            pool.submit(time.sleep, 0.01).result()
+        return pool
+
+    def handle(self, query: str) -> tuple[int, str, bytes]:
+        """Renders the image a request asks for.
+
+        Args:
+            query (str): Query string of the request.
+
+        Returns:
+            tuple[int, str, bytes]: HTTP status, content type and body.
+        """
+
+        try:
+            args: argparse.Namespace = parse_request(query, self.defaults)
+        except ValueError as error:
+            return 400, "text/plain", f"{error}\n".encode("utf-8")
+
+        started: float = time.perf_counter()
+        if not self.limit.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            return 503, "text/plain", b"Too many requests, try again later\n"
+        future: Optional[Future] = None
+        try:
+            with self._lock:
+                self.in_flight += 1
+            try:
+                with self._lock:
+                    pool: ProcessPoolExecutor = self._pool
+                    future = pool.submit(self.render, args)
+                    self._running[future] = pool
+                data: bytes = future.result(timeout=self.timeout)
+            except TimeoutError:
+                # Only a render that started has a worker to replace
+                if not future.cancel():
+                    self._retire(pool, future)
+                with self._lock:
+                    self.timed_out += 1
+                return 504, "text/plain", b"Render took too long\n"
+            except BrokenProcessPool as error:
+                # A worker died; later requests get a fresh pool
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = self._start_pool()
+                return self._failure(error)
+            except (CancelledError, Exception) as error:
+                return self._failure(error)
+            self.latency.record(time.perf_counter() - started)
+            return 200, "image/png", data
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._running.pop(future, None)
+            self.limit.release()
+
+    def _retire(self, pool: ProcessPoolExecutor, stuck: Future) -> None:
+        """Replaces a pool with a worker stuck on a render.
+
+        A pool's workers can't be stopped one at a time, so later requests
+        get a fresh pool, and the old one's workers are killed once its
+        other renders are done (or have had the time they're allowed).
+
+        Args:
+            pool (ProcessPoolExecutor): Pool the render was submitted to.
+            stuck (Future): Render that took too long.
+        """
+
+        with self._lock:
+            if self._pool is not pool:
+                # Another request's timeout already replaced it
+                return
+            self._pool = self._start_pool()
+            others: list[Future] = [
+                future
+                for future, owner in self._running.items()
+                if owner is pool and future is not stuck
+            ]
+
+        def kill() -> None:
+            wait(others, timeout=self.timeout)
+            for process in list(pool._processes.values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        threading.Thread(target=kill, daemon=True).start()
+
+    def _failure(self, error: BaseException) -> tuple[int, str, bytes]:
+        print(f"Render failed: {error!r}", file=sys.stderr)
+        with self._lock:
+            self.failed += 1
+        return 500, "text/plain", f"Render failed: {error!r}\n".encode("utf-8")
+
+    def stats(self) -> dict[str, Any]:
+        """Reports the server's load and latencies.
+
+        Returns:
+            dict[str, Any]: Workers, concurrency limit, requests in flight,
+                rejected, failed and timed out requests, and the latency
+                histogram.
+        """
+
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_concurrent": self.max_concurrent,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "latency": self.latency.snapshot(),
+            }
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+
+        self._pool.shutdown(cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """Class to answer HTTP requests to the render server.
+
+    GET /render?size=...&seed=... returns a PNG, and GET /stats returns the
+    server's stats as JSON.
+    """
+
+    service: RenderService
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/render":
+            status, content_type, body = self.service.handle(url.query)
+        elif url.path == "/stats":
+            status, content_type = 200, "application/json"
+            body = json.dumps(self.service.stats(), indent=2).encode("utf-8")
+        else:
+            status, content_type, body = 404, "text/plain", b"Not found\n"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix sockets have no client address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # The stats endpoint covers what the access log would say
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Class to serve HTTP over a Unix socket, a thread per connection."""
+
+    daemon_threads: bool = True
+
+    def get_request(self) -> tuple[Any, Any]:
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def serve(
+    address: str,
+    render: Callable[[argparse.Namespace], bytes],
+    defaults: argparse.Namespace,
+    workers: int,
+    max_concurrent: int,
+    timeout: float = 60.0,
+) -> None:
+    """Runs the render server until it's interrupted.
+
+    Args:
+        address (str): Where to listen: 'unix:/path/to/socket', or
+            'host:port' (meant for localhost; there's no authentication).
+        render (Callable[[argparse.Namespace], bytes]): Renders one image to
+            PNG bytes. Must be picklable (a module level function).
+        defaults (argparse.Namespace): Namespace of the arguments passed to
+            the server, used for anything a request leaves out.
+        workers (int): How many processes render images.
+        max_concurrent (int): How many requests can be rendered or wait for
+            a worker at the same time. Any more wait for a slot, and are
+            turned away with a 503 if none frees up in time.
+        timeout (float): Seconds a request can take to render before it gets
+            a 504, and the worker rendering it is replaced.
+    """
+
+    service: RenderService = RenderService(
+        render, defaults, max(workers, 1), max_concurrent, timeout=timeout
+    )
+    handler: type = type("Handler", (RenderHandler,), {"service": service})
+
+    server: socketserver.BaseServer
+    if address.startswith("unix:"):
+        path: str = address[len("unix:") :]
+        if os.path.exists(path):
+            os.remove(path)
+        server = UnixHTTPServer(path, handler)
+    else:
+        host, _, port = address.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), handler)
+
+    print(f"Serving on {address} with {service.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if address.startswith("unix:"):
+            os.remove(address[len("unix:") :])
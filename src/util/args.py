@@ -2,6 +2,11 @@
 
 import argparse
 
+from src.batch.shard import parse_index_range, parse_shard
+from src.points.generator import GENERATORS
+from src.render.downsample import APRONS
+from src.render.renderer import RENDERERS, ChunkedRendererInterface
+
 
 def parse_args() -> argparse.Namespace:
     """Parses the arguments.
@@ -53,5 +58,179 @@ def parse_args() -> argparse.Namespace:
         required=False,
         default=10,
     )
+    parser.add_argument(
+        "--generator",
+        type=str,
+        help="how to generate the points",
+        required=False,
+        choices=sorted(GENERATORS),
+        default="random",
+    )
+    parser.add_argument(
+        "--renderer",
+        type=str,
+        help="how to draw the lines",
+        required=False,
+        choices=sorted(RENDERERS),
+        default="overlay",
+    )
+    parser.add_argument(
+        "--resample",
+        type=str,
+        help="filter used to shrink the supersampled image",
+        required=False,
+        choices=sorted(APRONS),
+        default="lanczos",
+    )
+    parser.add_argument(
+        "--tile_size",
+        type=int,
+        help="size of the tiles used by the tiled renderer",
+        required=False,
+        default=512,
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="how many tiles the tiled renderer draws at the same time",
+        required=False,
+        default=1,
+    )
+    parser.add_argument(
+        "--order",
+        help="reorder the points into a short path before drawing them",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--order_passes",
+        type=int,
+        help="most passes to make over the path of --order to shorten it",
+        required=False,
+        default=2,
+    )
+    parser.add_argument(
+        "--order_budget",
+        type=float,
+        help="seconds after which to stop shortening the path of --order anyway",
+        required=False,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--stream",
+        help="draw the points as they're generated instead of keeping them",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="how many processes to generate images with",
+        required=False,
+        default=1,
+    )
+    parser.add_argument(
+        "--pipeline",
+        help="overlap the stages of consecutive images",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--queue_depth",
+        type=int,
+        help="how many images can wait between two pipeline stages",
+        required=False,
+        default=2,
+    )
+    parser.add_argument(
+        "--resume",
+        help="skip the images the collection's manifest lists as finished",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="only generate every N-th image, starting at K (K/N)",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--index_range",
+        type=parse_index_range,
+        help="only generate the images from a up to b (a:b)",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--merge",
+        help="combine the collection's manifests and report missing images",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--spool",
+        type=str,
+        help="work through the jobs queued in this folder",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--submit",
+        help="queue the collection's images in the --spool folder and exit",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        help="seconds before a spool job claimed by a worker is handed out again",
+        required=False,
+        default=600.0,
+    )
+    parser.add_argument(
+        "--serve",
+        type=str,
+        help="answer render requests on unix:/path/to/socket or host:port",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_concurrent",
+        type=int,
+        help="how many render requests the server takes at the same time",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--render_timeout",
+        type=float,
+        help="seconds a render request can take before the server gives up on it",
+        required=False,
+        default=60.0,
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="seed to make the collection reproducible",
+        required=False,
+        default=None,
+    )
 
-    return parser.parse_args()
+    # Catch the combinations that would fail every image, before starting
+    args: argparse.Namespace = parser.parse_args()
+    if args.threads < 1:
+        parser.error("--threads must be at least 1")
+    if args.stream and not issubclass(
+        RENDERERS[args.renderer], ChunkedRendererInterface
+    ):
+        streaming: list[str] = sorted(
+            name
+            for name, renderer in RENDERERS.items()
+            if issubclass(renderer, ChunkedRendererInterface)
+        )
+        parser.error(f"--stream only works with --renderer {' or '.join(streaming)}")
+    if args.stream and args.order:
+        parser.error("--stream and --order can't be used together")
+    return args
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+# The process's umask, read once (setting it is the only way to read it, and
+# that isn't safe to do while other threads might be creating files)
+_UMASK: int = os.umask(0o022)
+os.umask(_UMASK)
+
+
+class HashingWriter:
+    """Class to pass writes through to a file while hashing them.
+
+    Attributes:
+        file (BinaryIO): File being written.
+        digest (hashlib._Hash): SHA-256 of everything written so far.
+    """
+
+    def __init__(self, file: BinaryIO) -> None:
+        self.file: BinaryIO = file
+        self.digest = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def hexdigest(self) -> str:
+        """Returns the SHA-256 of everything written so far, in hex."""
+
+        return self.digest.hexdigest()
+
+
+@contextmanager
+def atomic_open(path: str) -> Iterator[BinaryIO]:
+    """Opens a file for writing that only appears once it's complete.
+
+    The data goes to a temporary file in the same directory, which is renamed
+    over path when the block finishes. If the block raises (or the process
+    dies), path is left as it was. The file gets the same permissions a
+    plainly opened one would, not the private ones of a temporary file.
+
+    Args:
+        path (str): Where the file should end up.
+
+    Yields:
+        BinaryIO: Temporary file to write to.
+    """
+
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", dir=directory or ".")
+    try:
+        os.fchmod(fd, 0o666 & ~_UMASK)
+        with os.fdopen(fd, "wb") as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_atomic(path: str, data: bytes) -> str:
+    """Writes a whole file atomically.
+
+    Args:
+        path (str): Where to write the file.
+        data (bytes): Contents of the file.
+
+    Returns:
+        str: SHA-256 of the contents, in hex.
+    """
+
+    with atomic_open(path) as file:
+        file.write(data)
+    return hashlib.sha256(data).hexdigest()
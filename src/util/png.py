@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import io
+import struct
+import zlib
+from typing import BinaryIO, Iterable
+
+import numpy as np
+from PIL import Image
+
+
+def _write_chunk(file: BinaryIO, kind: bytes, data: bytes) -> None:
+    """Writes one length-prefixed, checksummed PNG chunk."""
+
+    file.write(struct.pack(">I", len(data)))
+    file.write(kind)
+    file.write(data)
+    file.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+
+def write_png(
+    file: BinaryIO,
+    width: int,
+    height: int,
+    bands: Iterable[np.ndarray],
+    compress_level: int = 6,
+) -> None:
+    """Saves an RGB image as a PNG, one horizontal band at a time.
+
+    Only the band being compressed needs to be in memory, so images bigger
+    than RAM can be written as they are drawn.
+
+    Args:
+        file (BinaryIO): Where to write the image.
+        width (int): Width of the image (in pixels).
+        height (int): Height of the image (in pixels).
+        bands (Iterable[np.ndarray]): (rows, width, 3) uint8 arrays, from top
+            to bottom, adding up to the height of the image.
+        compress_level (int): zlib compression level (0-9).
+    """
+
+    compressor = zlib.compressobj(compress_level)
+    previous: np.ndarray = np.zeros(width * 3, dtype=np.uint8)
+    scratch: np.ndarray = np.empty((0, width * 3 + 1), dtype=np.uint8)
+    rows: int = 0
+
+    file.write(b"\x89PNG\r\n\x1a\n")
+    _write_chunk(
+        file, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    )
+
+    for band in bands:
+        pixels: np.ndarray = band.reshape(len(band), width * 3)
+
+        # The bands are all about the same size, so their scratch is reused
+        if len(scratch) < len(band):
+            scratch = np.empty((len(band), width * 3 + 1), dtype=np.uint8)
+        filtered: np.ndarray = scratch[: len(band)]
+
+        # "Up" filter: store each row as the difference from the one above
+        filtered[:, 0] = 2
+        np.subtract(pixels[0], previous, out=filtered[0, 1:])
+        np.subtract(pixels[1:], pixels[:-1], out=filtered[1:, 1:])
+
+        data: bytes = compressor.compress(filtered)
+        if data:
+            _write_chunk(file, b"IDAT", data)
+        previous = pixels[-1].copy()
+        rows += len(band)
+
+    if rows != height:
+        raise ValueError(f"Expected {height} rows, but got {rows}")
+
+    _write_chunk(file, b"IDAT", compressor.flush())
+    _write_chunk(file, b"IEND", b"")
+
+
+def encode_png(img: Image.Image) -> bytes:
+    """Compresses an image into PNG bytes, without touching the disk.
+
+    Args:
+        img (Image.Image): Image to compress.
+
+    Returns:
+        bytes: Contents of the PNG file.
+    """
+
+    buffer: io.BytesIO = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
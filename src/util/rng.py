@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+from typing import Optional
+
+import numpy as np
+
+
+def image_rng(seed: Optional[int], index: int) -> np.random.Generator:
+    """Makes the source of randomness for one image of a collection.
+
+    Each index gets its own independent stream, derived from the seed and
+    the index alone, so an image comes out the same however the collection
+    is split up between processes or machines.
+
+    Args:
+        seed (Optional[int]): Seed of the collection, or None for fresh
+            randomness.
+        index (int): Which image of the collection the stream is for.
+
+    Returns:
+        np.random.Generator: Generator to use for everything in the image.
+    """
+
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from PIL import Image, ImageChops, ImageDraw
+
+from src.art.image import ArtParams, Sketch, sketch
+from src.render.downsample import downsample
+from src.render.renderer import AccumulateRenderer, OverlayRenderer
+from src.render.segment import segments
+from src.util.rng import image_rng
+
+
+def full_canvas_overlays(drawing: Sketch, params: ArtParams) -> Image.Image:
+    """Draws an image like the original script: a full-size overlay per line.
+
+    Args:
+        drawing (Sketch): Points and colors of the image.
+        params (ArtParams): How to draw the image.
+
+    Returns:
+        Image.Image: The image, at its final size.
+    """
+
+    size: int = params.size * params.scale_factor
+    img: Image.Image = Image.new("RGB", (size, size))
+    for segment in segments(
+        drawing.points, drawing.start_color, drawing.end_color, params.scale_factor
+    ):
+        overlay_img: Image.Image = Image.new("RGB", (size, size))
+        ImageDraw.Draw(overlay_img).line(
+            (segment.start, segment.end),
+            fill=segment.color,
+            width=segment.thickness,
+        )
+        img = ImageChops.add(img, overlay_img)
+    return downsample(img, params.scale_factor, params.resample)
+
+
+class TestOverlay(unittest.TestCase):
+    """Checks the clipped overlays against the original full-canvas ones."""
+
+    def check(self, params: ArtParams, seeds: range) -> None:
+        for seed in seeds:
+            drawing: Sketch = sketch(params, image_rng(seed, 0))
+            expected: bytes = full_canvas_overlays(drawing, params).tobytes()
+            for renderer in (OverlayRenderer(), AccumulateRenderer()):
+                with self.subTest(seed=seed, renderer=type(renderer).__name__):
+                    img: Image.Image = renderer.render(
+                        drawing.points,
+                        drawing.start_color,
+                        drawing.end_color,
+                        params.size,
+                        params.scale_factor,
+                    )
+                    self.assertEqual(img.tobytes(), expected)
+
+    def test_scale_2(self) -> None:
+        self.check(ArtParams(size=720, scale_factor=2, num_points=10), range(30))
+
+    def test_scale_4(self) -> None:
+        self.check(ArtParams(size=720, scale_factor=4, num_points=10), range(30))
+
+    def test_many_points(self) -> None:
+        self.check(ArtParams(size=256, scale_factor=4, num_points=25), range(5))
+
+
+if __name__ == "__main__":
+    unittest.main()